@@ -0,0 +1,2 @@
+# Standalone benchmark / load scripts. Run from the repo root, e.g.
+#   python -m benchmarks.booking_load
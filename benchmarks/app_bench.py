@@ -0,0 +1,301 @@
+# app_bench.py
+# End-to-end benchmark of the hot pages. Seeds a fresh SQLite database with
+# users, events, comments and bookings, then drives create_app() through the
+# Flask test client (or a real local WSGI server with --server) at each
+# concurrency level and prints one JSON report: p50/p95/p99 latency,
+# requests/s and SQL statements per request for every endpoint.
+#
+#   python -m benchmarks.app_bench --events 20000 --concurrency 1 4 16 -o before.json
+#   git checkout other-branch
+#   python -m benchmarks.app_bench --events 20000 --concurrency 1 4 16 -o after.json
+#
+# Everything random is seeded, so two runs against different commits see the
+# same data and the same request mix.
+import argparse
+import http.cookiejar
+import json
+import random
+import subprocess
+import sys
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+from website import db
+from website.bulk import coerce_rows, import_rows
+from website.lifecycle import advance_event_status
+from website.models import Comment, Event
+from website.passwords import hash_password
+
+from .common import make_app, percentile, Timer
+
+PASSWORD = 'benchmark-password'
+REGIONS = ['OCE', 'NA-Central', 'NA-East', 'EU', 'ASIA', 'LAN']
+MODES = ['Battle Royale', 'Zero Build', 'Reload', 'Creative']
+CATEGORIES = ['Community', 'Amateur', 'College', 'Pro']
+TEAM_SIZES = ['Solo', 'Duo', 'Trio', 'Squad']
+
+# name -> (method, path(rng, ctx), form data, needs login, follow redirects)
+# book_event and add_comment follow their redirects like a browser would,
+# which also consumes the success flash so sessions don't grow.
+# events_range asks for a random weekend in one region over the seeded
+# window; calendar for a random month of it.
+
+
+def _weekend(rng, ctx):
+    today = datetime.utcnow().date()
+    saturday = today + timedelta(days=5 - today.weekday() + 7 * rng.randint(-4, 25))
+    return (f"/events?from={saturday}&to={saturday + timedelta(days=1)}"
+            f"&region={rng.choice(REGIONS)}")
+
+
+def _month(rng, ctx):
+    month = (datetime.utcnow().replace(day=15) + timedelta(days=30 * rng.randint(-1, 6))).strftime('%Y-%m')
+    return f"/calendar?month={month}&region={rng.choice(REGIONS + [''])}"
+
+
+SCENARIOS = {
+    'index': ('GET', lambda rng, ctx: '/', None, False, False),
+    'event_details': ('GET', lambda rng, ctx: f"/events/{rng.choice(ctx['event_ids'])}", None, False, False),
+    'book_event': ('POST', lambda rng, ctx: f"/events/{rng.choice(ctx['bookable_ids'])}/book",
+                   {'quantity': '1'}, True, True),
+    'add_comment': ('POST', lambda rng, ctx: f"/events/{rng.choice(ctx['event_ids'])}/comment",
+                    {'body': 'gg'}, True, True),
+    'events_range': ('GET', _weekend, None, False, False),
+    'calendar': ('GET', _month, None, False, False),
+    'booking_history': ('GET', lambda rng, ctx: '/history', None, True, False),
+    'login': ('POST', lambda rng, ctx: '/login', None, False, False),
+}
+
+
+def seed(app, users, events, comments, bookings, seed_value=1):
+    """Fill the database; returns the ids the scenarios pick from."""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow().replace(microsecond=0)
+    with app.app_context():
+        password_hash = hash_password(PASSWORD)
+        import_rows('users', coerce_rows('users', (
+            {'id': i, 'name': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': password_hash}
+            for i in range(1, users + 1))))
+
+        # pick the bookings and comments first so the event counters match
+        planned = [(rng.randint(1, users), rng.randint(1, events), rng.randint(1, 4)) for _ in range(bookings)]
+        commented = [rng.randint(1, events) for _ in range(comments)]
+        seats, booking_counts, comment_counts = {}, {}, {}
+        for _, event_id, quantity in planned:
+            seats[event_id] = seats.get(event_id, 0) + quantity
+            booking_counts[event_id] = booking_counts.get(event_id, 0) + 1
+        for event_id in commented:
+            comment_counts[event_id] = comment_counts.get(event_id, 0) + 1
+
+        def event_rows():
+            for i in range(1, events + 1):
+                yield {
+                    'id': i,
+                    'title': f"{rng.choice(REGIONS)} {rng.choice(MODES)} Cup #{i}",
+                    'region': rng.choice(REGIONS),
+                    'mode': rng.choice(MODES),
+                    'category': rng.choice(CATEGORIES),
+                    'team_size': rng.choice(TEAM_SIZES),
+                    'status': 'Open',
+                    # mostly upcoming, some history for the status scheduler
+                    'start_at': now + timedelta(minutes=rng.randint(-30 * 1440, 180 * 1440)),
+                    'description': 'Benchmark tournament. ' * 10,
+                    'capacity': None,  # unlimited, so book_event never runs dry
+                    'seats_sold': seats.get(i, 0),
+                    'booking_count': booking_counts.get(i, 0),
+                    'comment_count': comment_counts.get(i, 0),
+                    'user_id': rng.randint(1, users),
+                }
+
+        import_rows('events', coerce_rows('events', event_rows()))
+        import_rows('bookings', coerce_rows('bookings', (
+            {'user_id': u, 'event_id': e, 'quantity': q,
+             'booked_at': now - timedelta(minutes=rng.randint(0, 60 * 1440))}
+            for u, e, q in planned)))
+        comment_rows = ({'event_id': e, 'author': f'user{rng.randint(1, users)}', 'body': 'gl hf',
+                         'created_at': now - timedelta(minutes=rng.randint(0, 30 * 1440))} for e in commented)
+        for offset in range(0, comments, 5000):
+            db.session.execute(db.insert(Comment), [next(comment_rows) for _ in range(min(5000, comments - offset))])
+            db.session.commit()
+
+        advance_event_status()
+        event_ids = list(range(1, events + 1))
+        bookable_ids = db.session.execute(db.select(Event.id).where(Event.status == 'Open')).scalars().all()
+        db.session.remove()
+    return {'event_ids': event_ids, 'bookable_ids': bookable_ids or event_ids, 'users': users}
+
+
+class TestClient:
+    """The Flask test client behind the small interface the workers use."""
+
+    def __init__(self, app, base=None):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, follow=False):
+        response = self.client.open(path, method=method, data=data, follow_redirects=follow)
+        return response.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPClient:
+    """urllib against a live server, with its own cookie jar."""
+
+    def __init__(self, app, base):
+        self.base = base
+        jar = http.cookiejar.CookieJar()
+        self.plain = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar), _NoRedirect)
+        self.following = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+    def request(self, method, path, data=None, follow=False):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base + path, data=body, method=method)
+        try:
+            with (self.following if follow else self.plain).open(req) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def _sql_totals(app):
+    # (requests, statements) so far, summed over endpoints
+    stats = app.extensions['sql_profiler'].stats
+    return sum(row[0] for row in stats.values()), sum(row[1] for row in stats.values())
+
+
+def run_scenario(app, client_class, base, ctx, name, concurrency, requests, seed_value):
+    method, path_for, data, needs_login, follow = SCENARIOS[name]
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(n):
+        rng = random.Random(seed_value * 1000 + n)
+        user = rng.randint(1, ctx['users'])
+        credentials = {'user_name': f'user{user}', 'password': PASSWORD}
+        client = client_class(app, base)
+        if needs_login:
+            client.request('POST', '/login', credentials)
+        mine = []
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            path = path_for(rng, ctx)
+            with Timer() as t:
+                status = client.request(method, path, credentials if name == 'login' else data, follow)
+            mine.append(t.elapsed * 1000)
+            # a successful login redirects; a failed one re-renders the form
+            if status >= 400 or (name == 'login' and status != 302):
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(mine)
+
+    requests_before, statements_before = _sql_totals(app)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    with Timer() as wall:
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+    requests_after, statements_after = _sql_totals(app)
+    handled = max(requests_after - requests_before, 1)
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / wall.elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        # includes the login each worker does up front and followed redirects
+        'sql_per_request': round((statements_after - statements_before) / handled, 2),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hot-endpoint latency/throughput benchmark")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=300, help="requests per endpoint and level")
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--server', action='store_true', help="go through a local threaded WSGI server")
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help="kept low so login measures the app, not bcrypt (see password_hashing)")
+    parser.add_argument('--write-behind', action='store_true', help="queue comments (COMMENT_WRITE_BEHIND)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('-o', '--output', help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    app = make_app(SQL_PROFILING=True, SQL_SLOW_QUERY_MS=10000, STATUS_SCHEDULER_INTERVAL=0,
+                   BCRYPT_LOG_ROUNDS=args.bcrypt_rounds, COMMENT_WRITE_BEHIND=args.write_behind)
+    app.logger.disabled = True
+    with Timer() as seeding:
+        ctx = seed(app, args.users, args.events, args.comments, args.bookings, args.seed)
+
+    server = None
+    base = None
+    client_class = TestClient
+    if args.server:
+        server, base = start_server(app)
+        client_class = HTTPClient
+
+    # anything the views print goes to stderr so stdout stays valid JSON
+    results = {}
+    with redirect_stdout(sys.stderr):
+        for name in args.endpoints:
+            results[name] = {}
+            for concurrency in args.concurrency:
+                results[name][str(concurrency)] = run_scenario(
+                    app, client_class, base, ctx, name, concurrency, args.requests, args.seed)
+    if server:
+        server.shutdown()
+
+    report = {
+        'commit': _commit(),
+        'driver': 'wsgi-server' if args.server else 'test-client',
+        'comment_write_behind': args.write_behind,
+        'rows': {'users': args.users, 'events': args.events,
+                 'comments': args.comments, 'bookings': args.bookings},
+        'seed_seconds': round(seeding.elapsed, 2),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
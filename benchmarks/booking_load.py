@@ -0,0 +1,125 @@
+# booking_load.py
+# Multi-threaded booking load test: many users race for a limited number of
+# seats. Checks nothing is oversold and reports bookings per second.
+#
+#   python -m benchmarks.booking_load --threads 16 --attempts 200 --capacity 1000
+import argparse
+import json
+import threading
+from datetime import datetime, timedelta
+
+from website import db
+from website.booking import book_seats, book_many, BookingError
+from website.models import Event, User, Booking
+
+from .common import make_app, Timer
+
+
+def seed(app, users, capacity):
+    with app.app_context():
+        host = User(name='host', email='host@example.com', password_hash='x')
+        db.session.add(host)
+        db.session.flush()
+        event = Event(title='Load Test Cup', status='Open', capacity=capacity,
+                      start_at=datetime.utcnow() + timedelta(days=7), user_id=host.id)
+        db.session.add(event)
+        db.session.add_all(User(name=f'p{i}', email=f'p{i}@example.com', password_hash='x') for i in range(users))
+        db.session.commit()
+        user_ids = db.session.execute(db.select(User.id).where(User.id != host.id)).scalars().all()
+        return event.id, user_ids
+
+
+def run_threads(app, event_id, user_ids, threads, attempts, quantity):
+    counts = {'ok': 0, 'refused': 0}
+    lock = threading.Lock()
+
+    def worker(n):
+        ok = refused = 0
+        with app.app_context():
+            for i in range(attempts):
+                user_id = user_ids[(n * attempts + i) % len(user_ids)]
+                try:
+                    book_seats(event_id, user_id, quantity)
+                    ok += 1
+                except BookingError:
+                    refused += 1
+            db.session.remove()
+        with lock:
+            counts['ok'] += ok
+            counts['refused'] += refused
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    with Timer() as t:
+        for th in pool:
+            th.start()
+        for th in pool:
+            th.join()
+    return counts, t.elapsed
+
+
+def run_batch(app, event_id, user_ids, batch_size, quantity):
+    with app.app_context():
+        requests = [(event_id, uid, quantity) for uid in user_ids[:batch_size]]
+        with Timer() as t:
+            results = book_many(requests)
+        ok = sum(1 for r in results if not isinstance(r, BookingError))
+    return ok, t.elapsed
+
+
+def check(app, event_id):
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        booked = db.session.scalar(
+            db.select(db.func.coalesce(db.func.sum(Booking.quantity), 0)).where(Booking.event_id == event_id)
+        )
+        return {'capacity': event.capacity, 'seats_sold': event.seats_sold,
+                'booked_rows_total': booked, 'status': event.status}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--attempts', type=int, default=200, help='bookings tried per thread')
+    parser.add_argument('--capacity', type=int, default=1000)
+    parser.add_argument('--quantity', type=int, default=1)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=500, help='requests in the book_many run')
+    args = parser.parse_args(argv)
+
+    app = make_app()
+    event_id, user_ids = seed(app, args.users, args.capacity)
+    counts, elapsed = run_threads(app, event_id, user_ids, args.threads, args.attempts, args.quantity)
+    state = check(app, event_id)
+    oversold = state['seats_sold'] > state['capacity'] or state['booked_rows_total'] != state['seats_sold']
+
+    # a second event for the batch API
+    with app.app_context():
+        batch_event = Event(title='Batch Cup', status='Open', capacity=args.batch * args.quantity,
+                            start_at=datetime.utcnow() + timedelta(days=7), user_id=user_ids[0])
+        db.session.add(batch_event)
+        db.session.commit()
+        batch_event_id = batch_event.id
+    batch_ok, batch_elapsed = run_batch(app, batch_event_id, user_ids, args.batch, args.quantity)
+
+    report = {
+        'threads': args.threads,
+        'attempted': args.threads * args.attempts,
+        'booked': counts['ok'],
+        'refused': counts['refused'],
+        'seconds': round(elapsed, 3),
+        'bookings_per_sec': round(counts['ok'] / elapsed, 1) if elapsed else None,
+        'state': state,
+        'oversold': oversold,
+        'batch': {
+            'requests': args.batch,
+            'booked': batch_ok,
+            'seconds': round(batch_elapsed, 3),
+            'bookings_per_sec': round(batch_ok / batch_elapsed, 1) if batch_elapsed else None,
+        },
+    }
+    print(json.dumps(report, indent=2))
+    return 1 if oversold else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,42 @@
+# common.py
+# Helpers shared by the benchmark scripts: a throwaway app on its own SQLite
+# file, and timing/percentile utilities.
+import os
+import tempfile
+import time
+
+
+def make_app(db_path=None, profile='production', **config):
+    """create_app() pointed at a fresh SQLite file (migrations applied)."""
+    from website import create_app
+
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='fnbench-'), 'bench.sqlite')
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'DB_PROFILE': profile,
+        'WTF_CSRF_ENABLED': False,
+        'SECRET_KEY': 'benchmark',
+        'AUTO_MIGRATE': True,
+        # the load generators are one client hammering writes on purpose
+        'RATE_LIMITING': False,
+    }
+    settings.update(config)
+    return create_app(settings)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,64 @@
+# password_hashing.py
+# Logins per second at each bcrypt cost, hashing inline on the request
+# threads vs. handing it to the PASSWORD_HASH_WORKERS process pool.
+#
+#   python -m benchmarks.password_hashing --costs 10 11 12 13 --threads 8
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import make_app, Timer
+
+PASSWORD = 'correct horse battery staple'
+
+
+def run(app, hashed, logins, threads):
+    from website.passwords import verify_password
+
+    def login(_):
+        with app.app_context():
+            assert verify_password(hashed, PASSWORD)
+
+    with Timer() as t:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(login, range(logins)))
+    return t.elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="bcrypt login throughput per cost factor")
+    parser.add_argument('--costs', type=int, nargs='+', default=[10, 11, 12, 13])
+    parser.add_argument('--threads', type=int, default=8, help="concurrent request threads")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="hashing pool processes")
+    parser.add_argument('--seconds', type=float, default=2.0, help="rough time budget per measurement")
+    args = parser.parse_args(argv)
+    cores = os.cpu_count() or 1
+
+    results = []
+    for cost in args.costs:
+        inline = make_app(BCRYPT_LOG_ROUNDS=cost)
+        pooled = make_app(BCRYPT_LOG_ROUNDS=cost, PASSWORD_HASH_WORKERS=args.workers)
+        with inline.app_context():
+            from website.passwords import hash_password
+            with Timer() as one:
+                hashed = hash_password(PASSWORD)
+        logins = max(args.threads, int(args.seconds / one.elapsed))
+
+        row = {'cost': cost, 'single_hash_ms': round(one.elapsed * 1000, 1), 'logins': logins}
+        for mode, app in (('inline', inline), ('pool', pooled)):
+            run(app, hashed, args.threads, args.threads)  # warm up (spawns pool processes)
+            elapsed = run(app, hashed, logins, args.threads)
+            row[f'{mode}_logins_per_s'] = round(logins / elapsed, 1)
+            row[f'{mode}_logins_per_s_per_core'] = round(logins / elapsed / cores, 1)
+        pool = pooled.extensions.get('password_pool')
+        if pool:
+            pool.shutdown()
+        results.append(row)
+
+    print(json.dumps({'cores': cores, 'threads': args.threads, 'workers': args.workers,
+                      'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
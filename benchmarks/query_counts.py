@@ -0,0 +1,86 @@
+# query_counts.py
+# N+1 guard for the list pages: renders each one with a small and a larger
+# dataset and fails (exit status 1) if the number of SQL statements differs,
+# i.e. if something on the page went back to a lazy load per row.
+#
+#   python -m benchmarks.query_counts
+#   python -m benchmarks.query_counts --sizes 2 12
+#
+# The index's events each have their own host and a booking, so a lazy
+# Event.host or a per-event booking count shows up as soon as there is more
+# than one row.
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from website import db
+from website.instrumentation import assert_constant_queries
+from website.models import Booking, Event, User
+from website.queries import DEFAULT_PAGE_SIZE
+
+from .common import make_app
+
+PROFILE_HOST = 1
+
+
+def seed_to(app, size):
+    """Bring the database up to `size` hosts, each with one event of their
+    own and one hosted by PROFILE_HOST (the profile page's rows)."""
+    start = datetime.utcnow() + timedelta(days=1)
+    with app.app_context():
+        if db.session.get(User, PROFILE_HOST) is None:
+            db.session.add(User(id=PROFILE_HOST, name='profile-host', email='profile@example.com',
+                                password_hash='x'))
+        have = db.session.scalar(db.select(db.func.count(Event.id)).where(Event.user_id == PROFILE_HOST))
+        for i in range(have, size):
+            host = User(name=f'host{i}', email=f'host{i}@example.com', password_hash='x')
+            db.session.add(host)
+            db.session.flush()
+            for user_id in (host.id, PROFILE_HOST):
+                event = Event(title=f'Cup #{i}', region='OCE', status='Open', user_id=user_id,
+                              start_at=start + timedelta(hours=i))
+                db.session.add(event)
+                db.session.flush()
+                db.session.add(Booking(order_id=Booking.new_order_id(), user_id=host.id,
+                                       event_id=event.id, quantity=1))
+        db.session.commit()
+        db.session.remove()
+
+
+def check(path, sizes):
+    # a fresh database per page, so every page starts from the smallest size
+    app = make_app()
+    seed_to(app, sizes[0])
+    client = app.test_client()
+    client.get(path)  # first request pays one-off setup queries
+
+    def run():
+        response = client.get(path)
+        assert response.status_code == 200, f"{path} returned {response.status_code}"
+
+    with app.app_context():
+        engine = db.engine
+    return assert_constant_queries(run, lambda n: seed_to(app, n), sizes, engine)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if a list page's query count grows with its rows")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[2, DEFAULT_PAGE_SIZE // 2],
+                        help="event counts to compare (keep them within one page)")
+    args = parser.parse_args(argv)
+
+    sizes = sorted(args.sizes)
+    pages = [('index', '/'), ('user_profile', f'/users/{PROFILE_HOST}')]
+    failed = False
+    for name, path in pages:
+        try:
+            count = check(path, sizes)
+            print(f"ok    {name}: {count} statement(s) at sizes {sizes}")
+        except AssertionError as e:
+            print(f"FAIL  {name}: {e}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+# registration_load.py
+# Concurrent registration load test. Requests come in groups that collide on
+# purpose (same user name with different emails, or same email with different
+# names) and are shuffled so the colliding requests race each other. Checks
+# that every group ends with exactly one account and that each loser gets the
+# matching form error, then compares throughput with the old
+# check-then-insert flow (two SELECTs before the INSERT).
+#
+# Insert-first hashes the password before it knows whether the name is free,
+# so a losing duplicate costs one bcrypt; with --collide 1 the old flow can
+# look faster, but it also crashes on lost races.
+#
+#   python -m benchmarks.registration_load --threads 16 --groups 1000 --collide 0.1
+import argparse
+import json
+import random
+import threading
+
+from flask import render_template, redirect, url_for
+from werkzeug.exceptions import InternalServerError
+
+from website import db
+from website.forms import RegisterForm
+from website.models import User
+from website.passwords import hash_password
+
+from .common import make_app, Timer
+
+NAME_TAKEN = 'Username already exists'
+EMAIL_TAKEN = 'Email already registered'
+
+
+def legacy_register():
+    # the register view as it was before: SELECT name, SELECT email, INSERT
+    form = RegisterForm()
+    if form.validate_on_submit():
+        if db.session.scalar(db.select(User).where(User.name == form.user_name.data)):
+            form.user_name.errors.append(NAME_TAKEN)
+            return render_template('register.html', form=form)
+        if db.session.scalar(db.select(User).where(User.email == form.email.data)):
+            form.email.errors.append(EMAIL_TAKEN)
+            return render_template('register.html', form=form)
+        db.session.add(User(name=form.user_name.data, email=form.email.data,
+                            password_hash=hash_password(form.password.data)))
+        db.session.commit()
+        return redirect(url_for('auth.login'))
+    return render_template('register.html', form=form)
+
+
+def build_requests(groups, per_group, collide, prefix, seed=1):
+    # -> list of (group, kind, form data); kind is the field that must collide.
+    # Only a `collide` fraction of groups get per_group requests, the rest are
+    # ordinary one-off sign-ups.
+    rng = random.Random(seed)
+    requests = []
+    colliding = int(groups * collide)
+    for g in range(groups):
+        kind = 'name' if g % 2 == 0 else 'email'
+        for k in range(per_group if g < colliding else 1):
+            name = f'{prefix}n{g}' if kind == 'name' else f'{prefix}n{g}x{k}'
+            email = f'{prefix}e{g}@example.com' if kind == 'email' else f'{prefix}e{g}x{k}@example.com'
+            requests.append((g, kind, {
+                'user_name': name, 'email': email,
+                'password': 'password123', 'confirm': 'password123',
+            }))
+    rng.shuffle(requests)
+    return requests
+
+
+def run(app, path, requests, threads):
+    outcomes = [None] * len(requests)
+    cursor = iter(range(len(requests)))
+    lock = threading.Lock()
+
+    def worker():
+        # no cookie jar: every request is a fresh visitor, and unread
+        # "Registration successful" flashes don't pile up in the session
+        client = app.test_client(use_cookies=False)
+        while True:
+            with lock:
+                i = next(cursor, None)
+            if i is None:
+                return
+            try:
+                response = client.post(path, data=requests[i][2])
+            except Exception as e:  # unhandled IntegrityError from a lost race
+                outcomes[i] = ('crash', type(e).__name__)
+                continue
+            if response.status_code == 302:
+                outcomes[i] = ('ok', None)
+            elif response.status_code >= 500:
+                outcomes[i] = ('crash', str(response.status_code))
+            else:
+                body = response.get_data(as_text=True)
+                outcomes[i] = ('refused', 'name' if NAME_TAKEN in body else
+                               'email' if EMAIL_TAKEN in body else 'other')
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    with Timer() as t:
+        for th in pool:
+            th.start()
+        for th in pool:
+            th.join()
+    return outcomes, t.elapsed
+
+
+def check(requests, outcomes):
+    winners = {}
+    report = {'ok': 0, 'refused': 0, 'crashed': 0, 'wrong_error': 0, 'groups_without_one_winner': 0}
+    for (group, kind, _), (result, detail) in zip(requests, outcomes):
+        if result == 'ok':
+            report['ok'] += 1
+            winners[group] = winners.get(group, 0) + 1
+        elif result == 'crash':
+            report['crashed'] += 1
+        else:
+            report['refused'] += 1
+            if detail != kind:
+                report['wrong_error'] += 1
+    groups = {group for group, _, _ in requests}
+    report['groups_without_one_winner'] = sum(1 for g in groups if winners.get(g, 0) != 1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent registration load test")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--groups', type=int, default=1000)
+    parser.add_argument('--per-group', type=int, default=3, help="requests in a colliding group")
+    parser.add_argument('--collide', type=float, default=0.1, help="fraction of groups that collide")
+    parser.add_argument('--rounds', type=int, default=4, help="bcrypt cost; kept low so the database is the bottleneck")
+    args = parser.parse_args(argv)
+
+    app = make_app(BCRYPT_LOG_ROUNDS=args.rounds, PROPAGATE_EXCEPTIONS=False)
+    app.add_url_rule('/_legacy_register', 'legacy_register', legacy_register, methods=['POST'])
+    # count unhandled errors as 500s instead of raising into the test client
+    app.register_error_handler(InternalServerError, lambda e: ('error', 500))
+    app.logger.disabled = True
+
+    report = {'threads': args.threads, 'groups': args.groups,
+              'per_group': args.per_group, 'collide': args.collide}
+    for mode, path, prefix in (('check_then_insert', '/_legacy_register', 'a'),
+                               ('insert_first', '/register', 'b')):
+        requests = build_requests(args.groups, args.per_group, args.collide, prefix)
+        outcomes, elapsed = run(app, path, requests, args.threads)
+        result = check(requests, outcomes)
+        result['seconds'] = round(elapsed, 3)
+        result['registrations_per_s'] = round(len(requests) / elapsed, 1)
+        report[mode] = result
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
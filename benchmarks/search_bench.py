@@ -0,0 +1,103 @@
+# search_bench.py
+# Seeds N events and times ranked full-text queries through search_event_ids.
+#
+#   python -m benchmarks.search_bench --events 100000 --queries 200
+import argparse
+import itertools
+import json
+import random
+from datetime import datetime, timedelta
+
+from website import db
+from website.models import Event, User
+from website.search import search_event_ids
+
+from .common import make_app, percentile, Timer
+
+REGIONS = ['OCE', 'NA-Central', 'NA-East', 'EU', 'ASIA', 'LAN']
+MODES = ['Battle Royale', 'Zero Build', 'Reload', 'Creative']
+CATEGORIES = ['Community', 'Amateur', 'College', 'Pro']
+VOCABULARY = 20000
+
+
+def make_words(rng, size=VOCABULARY):
+    # pronounceable fake words; drawn with a Zipf-like skew below so the
+    # corpus has a few very common terms and a long tail, like real text
+    syllables = ['ka', 'zo', 'ne', 'ri', 'tu', 'mo', 'la', 'vi', 'se', 'da', 'po', 'gu', 'xe', 'fy']
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    return words, cum_weights
+
+
+def seed(app, count, chunk=5000):
+    """Insert `count` events; returns a sample of titles to build queries from."""
+    rng = random.Random(42)
+    words, cum_weights = make_words(rng)
+    start = datetime(2026, 1, 1)
+    titles = []
+    with app.app_context():
+        host = User(name='host', email='host@example.com', password_hash='x')
+        db.session.add(host)
+        db.session.commit()
+        for offset in range(0, count, chunk):
+            rows = [
+                {
+                    'title': ' '.join(rng.choices(words, cum_weights=cum_weights, k=3)).title(),
+                    'description': ' '.join(rng.choices(words, cum_weights=cum_weights, k=25)),
+                    'region': rng.choice(REGIONS),
+                    'mode': rng.choice(MODES),
+                    'category': rng.choice(CATEGORIES),
+                    'team_size': 'Solo',
+                    'status': 'Open',
+                    'start_at': start + timedelta(minutes=rng.randrange(525600)),
+                    'user_id': host.id,
+                }
+                for _ in range(min(chunk, count - offset))
+            ]
+            db.session.execute(db.insert(Event), rows)  # executemany; triggers fill event_fts
+            db.session.commit()
+            titles.extend(row['title'] for row in rows[:20])
+    return titles
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search latency benchmark")
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    app = make_app()
+    with Timer() as seeding:
+        titles = seed(app, args.events)
+
+    # queries: one or two words taken from real titles
+    rng = random.Random(7)
+    queries = []
+    for _ in range(args.queries):
+        words = rng.choice(titles).split()
+        queries.append(' '.join(rng.sample(words, rng.randint(1, 2))))
+
+    samples = []
+    with app.app_context():
+        for i, query in enumerate(queries):
+            with Timer() as t:
+                search_event_ids(query, page=1 + i % 3)
+            samples.append(t.elapsed * 1000)
+
+    report = {
+        'events': args.events,
+        'seed_seconds': round(seeding.elapsed, 2),
+        'queries': args.queries,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'max_ms': round(max(samples), 3),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
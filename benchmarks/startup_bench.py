@@ -0,0 +1,97 @@
+# startup_bench.py
+# Cold start of a web worker: each run is a fresh interpreter that imports
+# the app, calls create_app() and serves its first request, the way a
+# pre-fork server boots (or recycles) each worker. Prints one JSON report
+# with p50/max per phase.
+#
+#   python -m benchmarks.startup_bench --runs 10
+#   python -m benchmarks.startup_bench --workers 4     # 4 booting at once
+#   python -m benchmarks.startup_bench --config development
+#
+# The database is migrated once up front, like "flask db upgrade" at deploy,
+# so the production numbers show what a worker pays on its own.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import make_app, percentile
+
+# runs in the child; timings in ms on stdout as JSON
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+from website import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[1])
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'status': response.status_code,
+    'modules': len(sys.modules),
+}))
+"""
+
+PHASES = ('process_ms', 'import_ms', 'create_app_ms', 'first_request_ms')
+
+
+def boot_once(env, path):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD, path], env=env,
+                            capture_output=True, text=True, check=True)
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    # whole process: interpreter start-up, boot and first request
+    sample['process_ms'] = (time.perf_counter() - started) * 1000
+    return sample
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker cold-start benchmark")
+    parser.add_argument('--runs', type=int, default=10, help="boots per worker slot")
+    parser.add_argument('--workers', type=int, default=1, help="processes booting at the same time")
+    parser.add_argument('--config', choices=['production', 'development'], default='production')
+    parser.add_argument('--path', default='/', help="first request each worker serves")
+    parser.add_argument('-o', '--output', help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='fnbench-'), 'bench.sqlite')
+    make_app(db_path)  # applies the migrations once
+    env = dict(os.environ,
+               APP_CONFIG=args.config,
+               SECRET_KEY='benchmark',
+               DATABASE_URL=f'sqlite:///{db_path}')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), env.get('PYTHONPATH')]))
+
+    boot_once(env, args.path)  # warm the OS file cache and .pyc files
+    samples = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for _ in range(args.runs):
+            samples.extend(pool.map(lambda _: boot_once(env, args.path), range(args.workers)))
+
+    report = {
+        'config': args.config,
+        'workers': args.workers,
+        'boots': len(samples),
+        'status': sorted({s['status'] for s in samples}),
+        'modules_loaded': max(s['modules'] for s in samples),
+    }
+    for phase in PHASES:
+        values = [s[phase] for s in samples]
+        report[phase] = {'p50': round(percentile(values, 50), 1), 'max': round(max(values), 1)}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
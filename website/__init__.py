@@ -1,3 +1,5 @@
+import os
+
 from flask import Flask
 from flask_bootstrap import Bootstrap5
 from flask_sqlalchemy import SQLAlchemy
@@ -5,20 +7,60 @@ from flask_login import LoginManager
 
 db = SQLAlchemy()
 
-def create_app():
+def create_app(test_config=None, config_name=None):
     app = Flask(__name__)
-    app.debug = True
-    app.secret_key = 'somesecretkey'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///sitedata.sqlite'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # APP_CONFIG (or config_name) picks DevelopmentConfig / ProductionConfig
+    from .config import config_class, init_db_config, apply_sqlite_pragmas
+    app.config.from_object(config_class(config_name))
+    if test_config:
+        app.config.update(test_config)
+    if not app.config.get('SECRET_KEY'):
+        raise RuntimeError("SECRET_KEY is not set; export SECRET_KEY for this environment")
+
+    # DATABASE_URL / DB_PROFILE pick the database and engine tuning
+    init_db_config(app)
+
+    # Opt-in SQL profiling: per-endpoint stats at /_metrics (localhost only)
+    app.config.setdefault('SQL_PROFILING', os.environ.get('SQL_PROFILING', '').lower() in ('1', 'true', 'yes'))
+    app.config.setdefault('SQL_SLOW_QUERY_MS', float(os.environ.get('SQL_SLOW_QUERY_MS', 100)))
 
     # Where to store uploaded images (relative to your package)
     # The files will end up in <yourpkg>/static/image/uploads
-    app.config['UPLOAD_FOLDER'] = 'static/image/uploads'
+    app.config.setdefault('UPLOAD_FOLDER', 'static/image/uploads')
 
     db.init_app(app)
     Bootstrap5(app)
 
+    if app.config['DB_PROFILE'] == 'production':
+        with app.app_context():
+            if db.engine.dialect.name == 'sqlite':
+                apply_sqlite_pragmas(db.engine)
+
+    from .instrumentation import SQLProfiler
+    SQLProfiler(app)
+
+    # versioned fragment cache for event pages
+    from .cache import init_cache
+    init_cache(app)
+
+    # bcrypt cost / optional hashing process pool
+    from .passwords import init_passwords
+    init_passwords(app)
+
+    # fingerprinted/precompressed static files (flask collect-static)
+    from .assets import init_assets
+    init_assets(app)
+
+    # banner uploads + background variant rendering
+    from .media import init_media
+    init_media(app)
+
+    # token buckets for booking/commenting, optional comment write-behind
+    from .ratelimit import init_ratelimit
+    init_ratelimit(app)
+    from .comments import init_comments
+    init_comments(app)
+
     login_manager = LoginManager()
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
@@ -37,14 +79,35 @@ def create_app():
     from .views import main_bp
     app.register_blueprint(main_bp)
 
-    try:
-        from .auth import auth_bp
-        app.register_blueprint(auth_bp)
-    except Exception:
-        pass
+    # read-only JSON API for the mobile client
+    from .api import api_bp
+    app.register_blueprint(api_bp)
+
+    from .auth import auth_bp
+    app.register_blueprint(auth_bp)
+
+    # flask db upgrade at deploy time (applied here only with AUTO_MIGRATE)
+    from .migrations import init_migrations
+    init_migrations(app)
+
+    # full-text search (FTS5 / tsvector) + rebuild command
+    from .search import init_search
+    init_search(app)
+
+    # Open -> Live -> Completed by start_at, in a background thread + CLI
+    from .lifecycle import init_lifecycle
+    init_lifecycle(app)
+
+    # flask export-data / import-data
+    from .bulk import init_bulk
+    init_bulk(app)
+
+    # flask reconcile-counters
+    from .counters import init_counters
+    init_counters(app)
 
-    # Dev/assignment convenience: create tables if not exist
-    with app.app_context():
-        db.create_all()
+    # per-day/per-region calendar counts + rebuild command
+    from .availability import init_availability
+    init_availability(app)
 
     return app
@@ -0,0 +1,309 @@
+# api.py
+# Read-only JSON API for the mobile client, versioned under /api/v1.
+#
+#   GET /api/v1/events                     ?region=&category=&...&from=&to=&sort=&cursor=&limit=&fields=
+#   GET /api/v1/calendar                   ?month=&region=
+#   GET /api/v1/events/<id>                ?fields=
+#   GET /api/v1/events/<id>/comments       ?cursor=&limit=&fields=
+#   GET /api/v1/comments/<id>              ?fields=
+#   GET /api/v1/me/bookings                ?cursor=&limit=&fields=   (logged in)
+#   GET /api/v1/me/bookings/<order_id>     ?fields=                  (logged in)
+#
+# fields= picks a sparse fieldset ("fields=id,title,start_at"). Every response
+# carries a weak ETag built from row versions only (Event.updated_at,
+# Comment.created_at, Booking ids/times), which are read with small column
+# queries first; a matching If-None-Match gets a 304 before any full row is
+# loaded or serialized. Single resources also carry Last-Modified for
+# If-Modified-Since. Lists don't: a row leaving a page doesn't move its
+# newest timestamp, but it does change the ETag.
+import hashlib
+import json
+from datetime import timezone
+
+from flask import Blueprint, abort, current_app, request
+from flask_login import current_user
+from sqlalchemy.orm import joinedload
+from werkzeug.exceptions import HTTPException
+
+from . import db
+from .availability import month_start, month_summary, this_month
+from .media import banner_url
+from .models import Event, Comment, Booking
+from .queries import (
+    event_page_versions, events_by_id, event_filters_from_args, page_size_from_args, sort_from_args,
+    date_range_from_args,
+    comment_page, booking_page, COMMENT_PAGE_SIZE,
+)
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+# name -> getter; the order here is the order in the output
+EVENT_FIELDS = {
+    'id': lambda e: e.id,
+    'title': lambda e: e.title,
+    'status': lambda e: e.status,
+    'start_at': lambda e: _iso(e.start_at),
+    'region': lambda e: e.region,
+    'category': lambda e: e.category,
+    'mode': lambda e: e.mode,
+    'team_size': lambda e: e.team_size,
+    'prize': lambda e: e.prize,
+    'description': lambda e: e.description,
+    'banner': lambda e: banner_url(e),
+    'capacity': lambda e: e.capacity,
+    'seats_sold': lambda e: e.seats_sold,
+    'booking_count': lambda e: e.booking_count,
+    'comment_count': lambda e: e.comment_count,
+    'host': lambda e: e.host.name if e.host else None,
+    'updated_at': lambda e: _iso(e.updated_at),
+}
+
+COMMENT_FIELDS = {
+    'id': lambda c: c.id,
+    'event_id': lambda c: c.event_id,
+    'author': lambda c: c.author,
+    'body': lambda c: c.body,
+    'created_at': lambda c: _iso(c.created_at),
+}
+
+BOOKING_FIELDS = {
+    'order_id': lambda b: b.order_id,
+    'event_id': lambda b: b.event_id,
+    'event_title': lambda b: b.event.title if b.event else None,
+    'event_start_at': lambda b: _iso(b.event.start_at) if b.event else None,
+    'quantity': lambda b: b.quantity,
+    'status': lambda b: b.status,
+    'booked_at': lambda b: _iso(b.booked_at),
+}
+
+
+def _fieldset(available):
+    # ?fields=a,b -> the requested names in output order; 400 on unknown names
+    wanted = request.args.get('fields')
+    if not wanted:
+        return tuple(available)
+    names = {name.strip() for name in wanted.split(',') if name.strip()}
+    unknown = names - set(available)
+    if unknown:
+        abort(400, description=f"Unknown field(s): {', '.join(sorted(unknown))}")
+    return tuple(name for name in available if name in names)
+
+
+def _serialize(obj, available, fields):
+    return {name: available[name](obj) for name in fields}
+
+
+def _validator(*parts):
+    # weak ETag over the row versions + everything else that shapes the body
+    raw = json.dumps(parts, default=str, separators=(',', ':'))
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def _http_time(stamp):
+    # stored times are naive UTC; HTTP dates have whole seconds
+    return stamp.replace(microsecond=0, tzinfo=timezone.utc) if stamp else None
+
+
+def _not_modified(etag, last_modified, private=False):
+    """A 304 response if the client's copy is current, else None.
+
+    If-None-Match wins over If-Modified-Since when both are sent.
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        fresh = request.if_modified_since >= _http_time(last_modified)
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return _finish(current_app.response_class(status=304), etag, last_modified, private)
+
+
+def _finish(response, etag, last_modified, private=False):
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = _http_time(last_modified)
+    # clients may keep the body but must revalidate before using it
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+        response.vary.add('Cookie')
+    else:
+        response.cache_control.public = True
+    return response
+
+
+def _json(payload, etag, last_modified, private=False):
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    response = current_app.response_class(body, mimetype='application/json')
+    return _finish(response, etag, last_modified, private)
+
+
+def _conditional(etag, last_modified, build, private=False):
+    # build() loads and serializes; it only runs when the client needs a body
+    return (_not_modified(etag, last_modified, private)
+            or _json(build(), etag, last_modified, private))
+
+
+def _require_user():
+    if not current_user.is_authenticated:
+        abort(401, description="Log in to see your bookings.")
+    return current_user.id
+
+
+@api_bp.errorhandler(HTTPException)
+def api_error(e):
+    return current_app.response_class(
+        json.dumps({'error': e.name, 'message': e.description}, separators=(',', ':')),
+        status=e.code, mimetype='application/json',
+    )
+
+
+@api_bp.route('/events')
+def events():
+    fields = _fieldset(EVENT_FIELDS)
+    filters = event_filters_from_args(request.args)
+    cursor = request.args.get('cursor')
+    sort = sort_from_args(request.args)
+    try:
+        window = date_range_from_args(request.args)
+    except ValueError:
+        abort(400, description="from/to should be ISO dates or times, with from before to.")
+    versions, next_cursor = event_page_versions(filters, cursor, page_size_from_args(request.args), sort, window)
+    etag = _validator('events', sort, window, fields, [(r.id, r.updated_at) for r in versions], next_cursor)
+
+    def build():
+        page = events_by_id([r.id for r in versions])
+        return {'data': [_serialize(e, EVENT_FIELDS, fields) for e in page], 'next_cursor': next_cursor}
+
+    return _conditional(etag, None, build)
+
+
+@api_bp.route('/calendar')
+def calendar():
+    try:
+        first = month_start(request.args.get('month') or this_month())
+    except ValueError:
+        abort(400, description="month should look like 2026-10.")
+    region = request.args.get('region') or None
+    # at most a few hundred tiny rows, so build it outright; the ETag still
+    # saves the transfer
+    days, regions = month_summary(first, region)
+    payload = {
+        'month': first.strftime('%Y-%m'),
+        'region': region,
+        'regions': regions,
+        'days': [{'date': day.isoformat(), 'events': events, 'open': still_open}
+                 for day, (events, still_open) in sorted(days.items())],
+    }
+    return _conditional(_validator('calendar', payload), None, lambda: payload)
+
+
+@api_bp.route('/events/<int:event_id>')
+def event(event_id):
+    fields = _fieldset(EVENT_FIELDS)
+    updated_at = db.session.scalar(db.select(Event.updated_at).where(Event.id == event_id))
+    if updated_at is None:
+        abort(404, description="Event not found.")
+    etag = _validator('event', event_id, fields, updated_at)
+
+    def build():
+        row = db.session.execute(
+            db.select(Event).options(joinedload(Event.host)).where(Event.id == event_id)
+        ).scalar_one()
+        return {'data': _serialize(row, EVENT_FIELDS, fields)}
+
+    return _conditional(etag, updated_at, build)
+
+
+@api_bp.route('/events/<int:event_id>/comments')
+def event_comments(event_id):
+    fields = _fieldset(COMMENT_FIELDS)
+    # comments are never edited and add_comment bumps the event's counter
+    # (and so updated_at), so the event row versions its comment list
+    version = db.session.execute(
+        db.select(Event.updated_at, Event.comment_count).where(Event.id == event_id)
+    ).first()
+    if version is None:
+        abort(404, description="Event not found.")
+    cursor = request.args.get('cursor')
+    limit = page_size_from_args(request.args, default=COMMENT_PAGE_SIZE)
+    etag = _validator('comments', event_id, fields, tuple(version), cursor, limit)
+
+    def build():
+        comments, next_cursor = comment_page(event_id, cursor, limit)
+        return {'data': [_serialize(c, COMMENT_FIELDS, fields) for c in comments],
+                'next_cursor': next_cursor}
+
+    return _conditional(etag, None, build)
+
+
+@api_bp.route('/comments/<int:comment_id>')
+def comment(comment_id):
+    fields = _fieldset(COMMENT_FIELDS)
+    created_at = db.session.scalar(db.select(Comment.created_at).where(Comment.id == comment_id))
+    if created_at is None:
+        abort(404, description="Comment not found.")
+    etag = _validator('comment', comment_id, fields, created_at)
+
+    def build():
+        return {'data': _serialize(db.session.get(Comment, comment_id), COMMENT_FIELDS, fields)}
+
+    return _conditional(etag, created_at, build)
+
+
+def _booking_version(user_id, order_id=None):
+    # (count, newest id, newest booking, newest change to a booked event):
+    # one aggregate over the user's bookings, no rows loaded
+    stmt = (
+        db.select(db.func.count(Booking.id), db.func.max(Booking.id),
+                  db.func.max(Booking.booked_at), db.func.max(Event.updated_at))
+        .join(Event, Event.id == Booking.event_id)
+        .where(Booking.user_id == user_id)
+    )
+    if order_id is not None:
+        stmt = stmt.where(Booking.order_id == order_id)
+    return db.session.execute(stmt).one()
+
+
+@api_bp.route('/me/bookings')
+def my_bookings():
+    user_id = _require_user()
+    fields = _fieldset(BOOKING_FIELDS)
+    cursor = request.args.get('cursor')
+    limit = page_size_from_args(request.args)
+    version = _booking_version(user_id)
+    etag = _validator('bookings', user_id, fields, tuple(version), cursor, limit)
+
+    def build():
+        bookings, next_cursor = booking_page(user_id, cursor, limit)
+        return {'data': [_serialize(b, BOOKING_FIELDS, fields) for b in bookings],
+                'next_cursor': next_cursor}
+
+    return _conditional(etag, None, build, private=True)
+
+
+@api_bp.route('/me/bookings/<order_id>')
+def my_booking(order_id):
+    user_id = _require_user()
+    fields = _fieldset(BOOKING_FIELDS)
+    version = _booking_version(user_id, order_id)
+    if not version[0]:
+        abort(404, description="Booking not found.")
+    etag = _validator('booking', user_id, order_id, fields, tuple(version))
+    last_modified = max((v for v in version[2:] if v), default=None)
+
+    def build():
+        booking = db.session.execute(
+            db.select(Booking).options(joinedload(Booking.event))
+            .where(Booking.user_id == user_id, Booking.order_id == order_id)
+        ).scalar_one()
+        return {'data': _serialize(booking, BOOKING_FIELDS, fields)}
+
+    return _conditional(etag, last_modified, build, private=True)
@@ -0,0 +1,205 @@
+# assets.py
+# Fingerprinted, precompressed static files.
+#
+# "flask collect-static" copies everything under static/ (except uploads and
+# the output folder itself) to static/dist/ with a content hash in the name
+# (style/style.css -> style/style.3f9c0a1b2d4e.css), writes .gz and .br copies
+# of text assets (brotli is in requirements.txt; without it only .gz), and
+# records the mapping in static/dist/manifest.json. Relative url(...)s in CSS
+# are rewritten to the hashed names before the CSS itself is hashed.
+#
+# Templates keep calling url_for('static', filename=...): the template url_for
+# is swapped for one that returns /assets/<hashed name> for files in the
+# manifest and falls back to the plain static URL for everything else (and
+# when collect-static hasn't been run, e.g. in development). /assets/ serves
+# the best precompressed copy the client accepts with a one-year immutable
+# Cache-Control, which is safe because a changed file gets a new name.
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+import click
+from flask import Blueprint, abort, current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+ONE_YEAR = 365 * 24 * 3600
+# worth compressing; images are already compressed
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.ico'}
+# preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+assets_bp = Blueprint('assets', __name__, url_prefix='/assets')
+
+
+def dist_dir(app=None):
+    app = app or current_app
+    return os.path.join(app.static_folder, DIST_DIR)
+
+
+def _sources(app):
+    # (relative posix path, absolute path) of every collectable file
+    from .media import upload_dir
+
+    skip = {os.path.normpath(dist_dir(app)), os.path.normpath(upload_dir(app))}
+    for root, dirs, files in os.walk(app.static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.normpath(os.path.join(root, d)) not in skip)
+        for name in sorted(files):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, app.static_folder).replace(os.sep, '/'), path
+
+
+def _hashed_name(rel, data):
+    stem, ext = posixpath.splitext(rel)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _rewrite_css(rel, text, manifest):
+    # point relative url()s at the hashed copies; leave absolute/remote ones
+    base = posixpath.dirname(rel)
+
+    def replace(match):
+        quote, target = match.groups()
+        if target.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        path, _, suffix = target.partition('?')
+        resolved = posixpath.normpath(posixpath.join(base, path))
+        if resolved not in manifest:
+            return match.group(0)
+        new = posixpath.relpath(manifest[resolved], base or '.')
+        return f"url({quote}{new}{'?' + suffix if suffix else ''}{quote})"
+
+    return CSS_URL.sub(replace, text)
+
+
+def _compress(path, data):
+    # writes path.gz / path.br when they come out smaller; returns the encodings kept
+    kept = []
+    gz = gzip.compress(data, compresslevel=9, mtime=0)  # mtime=0: reproducible builds
+    if len(gz) < len(data):
+        with open(path + '.gz', 'wb') as f:
+            f.write(gz)
+        kept.append('gzip')
+    try:
+        import brotli
+    except ImportError:
+        return kept
+    br = brotli.compress(data, quality=11)
+    if len(br) < len(data):
+        with open(path + '.br', 'wb') as f:
+            f.write(br)
+        kept.append('br')
+    return kept
+
+
+def collect_static(app=None):
+    """Build static/dist and its manifest. Returns (manifest, stats)."""
+    app = app or current_app
+    out = dist_dir(app)
+    tmp = out + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    sources = list(_sources(app))
+    # CSS last, so the files it references already have their hashed names
+    sources.sort(key=lambda item: posixpath.splitext(item[0])[1] == '.css')
+    manifest = {}
+    stats = {'files': 0, 'bytes': 0, 'gzip': 0, 'br': 0}
+    for rel, path in sources:
+        with open(path, 'rb') as f:
+            data = f.read()
+        ext = posixpath.splitext(rel)[1].lower()
+        if ext == '.css':
+            data = _rewrite_css(rel, data.decode('utf-8'), manifest).encode('utf-8')
+        hashed = _hashed_name(rel, data)
+        target = os.path.join(tmp, *hashed.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        if ext in COMPRESSIBLE:
+            for encoding in _compress(target, data):
+                stats[encoding] += 1
+        manifest[rel] = hashed
+        stats['files'] += 1
+        stats['bytes'] += len(data)
+
+    with open(os.path.join(tmp, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    # swap the finished build in whole
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    app.extensions['asset_manifest'] = manifest
+    return manifest, stats
+
+
+def load_manifest(app):
+    try:
+        with open(os.path.join(dist_dir(app), MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def static_url(filename, **values):
+    """URL for a static file: the fingerprinted copy if there is one."""
+    hashed = current_app.extensions.get('asset_manifest', {}).get(filename)
+    if hashed:
+        return url_for('assets.serve', filename=hashed, **values)
+    return url_for('static', filename=filename, **values)
+
+
+def template_url_for(endpoint, **values):
+    # url_for for templates; only static files are redirected to /assets/
+    if endpoint == 'static' and 'filename' in values:
+        return static_url(values.pop('filename'), **values)
+    return url_for(endpoint, **values)
+
+
+@assets_bp.route('/<path:filename>')
+def serve(filename):
+    root = dist_dir()
+    if filename == MANIFEST:
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        compressed = safe_join(root, filename + suffix)
+        if accepted[encoding] and compressed and os.path.isfile(compressed):
+            response = send_from_directory(root, filename + suffix, mimetype=mimetype, max_age=ONE_YEAR)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(root, filename, mimetype=mimetype, max_age=ONE_YEAR)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@click.command('collect-static')
+@with_appcontext
+def collect_static_command():
+    """Fingerprint and precompress static files into static/dist."""
+    manifest, stats = collect_static()
+    click.echo(f"Collected {stats['files']} file(s), {stats['bytes'] / 1024:.0f} KB; "
+               f"{stats['gzip']} gzip, {stats['br']} brotli.")
+
+
+def init_assets(app):
+    app.extensions['asset_manifest'] = load_manifest(app)
+    app.jinja_env.globals['url_for'] = template_url_for
+    app.add_template_global(static_url)
+    app.cli.add_command(collect_static_command)
+    app.register_blueprint(assets_bp)
@@ -1,8 +1,9 @@
 from flask import Blueprint, flash, render_template, request, url_for, redirect
-from flask_bcrypt import generate_password_hash, check_password_hash
 from flask_login import login_user, login_required, logout_user
+from sqlalchemy.exc import IntegrityError
 from .models import User
-from .forms import LoginForm, RegisterForm
+from .passwords import hash_password, verify_password, needs_rehash
+from .dbutil import unique_violation
 from . import db
 
 # Create a blueprint - make sure all BPs have unique names
@@ -12,6 +13,7 @@ auth_bp = Blueprint('auth', __name__)
 @auth_bp.route('/login', methods=['GET', 'POST'])
 # view function
 def login():
+    from .forms import LoginForm
     login_form = LoginForm()
     error = None
     if login_form.validate_on_submit():
@@ -20,9 +22,13 @@ def login():
         user = db.session.scalar(db.select(User).where(User.name==user_name))
         if user is None:
             error = 'Incorrect user name'
-        elif not check_password_hash(user.password_hash, password): # takes the hash and cleartext password
+        elif not verify_password(user.password_hash, password): # takes the hash and cleartext password
             error = 'Incorrect password'
         if error is None:
+            # upgrade hashes made with a different BCRYPT_LOG_ROUNDS while we have the password
+            if needs_rehash(user.password_hash):
+                user.password_hash = hash_password(password)
+                db.session.commit()
             login_user(user)
             nextp = request.args.get('next') # this gives the url from where the login page was accessed
             print(nextp)
@@ -35,33 +41,33 @@ def login():
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
+    from .forms import RegisterForm
     register_form = RegisterForm()
     if register_form.validate_on_submit():
         user_name = register_form.user_name.data
         email = register_form.email.data
         password = register_form.password.data
         
-        # Check if user already exists
-        existing_user = db.session.scalar(db.select(User).where(User.name==user_name))
-        if existing_user:
-            flash('Username already exists. Please choose a different username.', 'error')
-            return render_template('register.html', form=register_form)
-        
-        existing_email = db.session.scalar(db.select(User).where(User.email==email))
-        if existing_email:
-            flash('Email already registered. Please use a different email.', 'error')
-            return render_template('register.html', form=register_form)
-        
-        # Create new user
-        password_hash = generate_password_hash(password)
+        # Insert first and let the unique indexes on name/email decide; a
+        # SELECT beforehand would cost a round-trip and still race.
         new_user = User(
             name=user_name,
             email=email,
-            password_hash=password_hash
+            password_hash=hash_password(password)
         )
-        
         db.session.add(new_user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            column = unique_violation(e, User.__tablename__)
+            if column == 'name':
+                register_form.user_name.errors.append('Username already exists. Please choose a different username.')
+            elif column == 'email':
+                register_form.email.errors.append('Email already registered. Please use a different email.')
+            else:
+                raise
+            return render_template('register.html', form=register_form)
         
         flash('Registration successful! Please log in.', 'success')
         return redirect(url_for('auth.login'))
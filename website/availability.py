@@ -0,0 +1,128 @@
+# availability.py
+# Per-day, per-region event counts for the calendar, so a month view is one
+# query over at most (days x regions) small rows instead of a scan of the
+# event table.
+#
+# Rows are kept current incrementally: every write that can change a count
+# (create/edit/cancel/reopen, a booking that sells the event out, status
+# scheduler passes) calls refresh_days() with the (day, region) pairs it
+# touched, in its own transaction. Each pair is recounted with one range
+# scan on ix_event_region_start_at. Bulk imports rebuild the whole table
+# ("flask rebuild-calendar" does the same by hand).
+#
+# Days are UTC dates, like the stored start times.
+from datetime import datetime, time, timedelta
+
+import click
+from flask.cli import with_appcontext
+
+from . import db
+from .dbutil import dialect_insert
+from .models import Event, EventDaySummary
+
+NO_REGION = ''
+# years the calendar pages will show
+CALENDAR_YEARS = range(1900, 9999)
+
+_not_cancelled = db.func.coalesce(Event.status, 'Open') != 'Cancelled'
+_open = db.case((db.func.coalesce(Event.status, 'Open') == 'Open', 1), else_=0)
+
+
+def day_key(start_at, region):
+    """The summary row an event counts towards, or None for TBA events."""
+    if start_at is None:
+        return None
+    return start_at.date(), region or NO_REGION
+
+
+def refresh_days(keys):
+    """Recount the summary rows for (day, region) pairs; doesn't commit."""
+    for day, region in {key for key in keys if key}:
+        start = datetime.combine(day, time.min)
+        in_region = (Event.region == region if region
+                     else db.or_(Event.region.is_(None), Event.region == NO_REGION))
+        total, still_open = db.session.execute(
+            db.select(db.func.count(Event.id), db.func.coalesce(db.func.sum(_open), 0))
+            .where(in_region, Event.start_at >= start, Event.start_at < start + timedelta(days=1),
+                   _not_cancelled)
+        ).one()
+        if not total:
+            db.session.execute(
+                db.delete(EventDaySummary)
+                .where(EventDaySummary.day == day, EventDaySummary.region == region)
+            )
+            continue
+        stmt = dialect_insert(EventDaySummary).values(
+            day=day, region=region, event_count=total, open_count=still_open
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['day', 'region'],
+            set_={'event_count': stmt.excluded.event_count, 'open_count': stmt.excluded.open_count},
+        ))
+
+
+def rebuild_day_summaries():
+    """Recompute the whole table from the event table in one statement."""
+    day = db.func.date(Event.start_at)
+    region = db.func.coalesce(Event.region, NO_REGION)
+    db.session.execute(db.delete(EventDaySummary))
+    db.session.execute(db.insert(EventDaySummary).from_select(
+        ['day', 'region', 'event_count', 'open_count'],
+        db.select(day, region, db.func.count(Event.id), db.func.sum(_open))
+        .where(Event.start_at.is_not(None), _not_cancelled)
+        .group_by(day, region),
+    ))
+    db.session.commit()
+
+
+def month_start(month):
+    """First day of a "YYYY-MM" month; ValueError if malformed or out of
+    CALENDAR_YEARS."""
+    first = datetime.strptime(month, '%Y-%m').date()
+    if first.year not in CALENDAR_YEARS:
+        # the grid and prev/next links step outside the month, which
+        # overflows date at years 1 and 9999
+        raise ValueError(f"{month} is outside the calendar")
+    return first
+
+
+def next_month(first):
+    return (first + timedelta(days=32)).replace(day=1)
+
+
+def month_summary(first, region=None):
+    """Counts for the month starting at `first`, from one aggregate query.
+
+    Returns ({day: (events, open)}, regions with events that month); `region`
+    narrows the counts but not the region list.
+    """
+    rows = db.session.execute(
+        db.select(EventDaySummary.day, EventDaySummary.region,
+                  EventDaySummary.event_count, EventDaySummary.open_count)
+        .where(EventDaySummary.day >= first, EventDaySummary.day < next_month(first))
+    ).all()
+    days = {}
+    for day, row_region, events, still_open in rows:
+        if region and row_region != region:
+            continue
+        total = days.get(day, (0, 0))
+        days[day] = (total[0] + events, total[1] + still_open)
+    regions = sorted({row.region for row in rows if row.region != NO_REGION})
+    return days, regions
+
+
+def this_month():
+    return datetime.utcnow().strftime('%Y-%m')
+
+
+@click.command('rebuild-calendar')
+@with_appcontext
+def rebuild_calendar_command():
+    """Recompute the per-day/per-region calendar counts."""
+    rebuild_day_summaries()
+    count = db.session.scalar(db.select(db.func.count()).select_from(EventDaySummary))
+    click.echo(f"Calendar rebuilt: {count} day/region row(s).")
+
+
+def init_availability(app):
+    app.cli.add_command(rebuild_calendar_command)
@@ -0,0 +1,217 @@
+# booking.py
+# Seat reservation. Seats are taken with a single conditional UPDATE on
+# Event.seats_sold, so two concurrent bookings can never both get the last
+# seat and we never have to COUNT(*) the booking table.
+import random
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .availability import day_key, refresh_days
+from .dbutil import dialect_insert
+from .models import Event, Booking, UserBookingSummary
+
+# SQLite raises "database is locked" when busy_timeout runs out; PostgreSQL
+# reports serialization failures / deadlocks. All of these are worth a retry.
+RETRYABLE_ERRORS = ('database is locked', 'database table is locked', 'could not serialize', 'deadlock detected')
+
+# upcoming_valid_until value that forces the next read to recount
+RECOUNT = datetime(1970, 1, 1)
+
+
+class BookingError(Exception):
+    """A booking that can't go through; the message is safe to flash."""
+
+
+def _take_seats(event_id, quantity):
+    # seats_sold on the right-hand side is the old value, so the Sold Out
+    # check and the capacity guard see the same row state.
+    # Returns the event's (start_at, status, region) after the update, or None
+    # if nothing matched.
+    new_total = Event.seats_sold + quantity
+    result = db.session.execute(
+        db.update(Event)
+        .where(
+            Event.id == event_id,
+            Event.status == 'Open',
+            db.or_(Event.capacity.is_(None), new_total <= Event.capacity),
+        )
+        .values(
+            seats_sold=new_total,
+            booking_count=Event.booking_count + 1,
+            status=db.case(
+                (db.and_(Event.capacity.is_not(None), new_total >= Event.capacity), 'Sold Out'),
+                else_=Event.status,
+            ),
+        )
+        .returning(Event.start_at, Event.status, Event.region)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
+
+
+def _refusal(event_id, quantity):
+    # only runs after the UPDATE matched nothing, to explain why
+    row = db.session.execute(
+        db.select(Event.status, Event.capacity, Event.seats_sold).where(Event.id == event_id)
+    ).first()
+    if row is None:
+        return BookingError("Event not found.")
+    status, capacity, sold = row
+    if (status or 'Open') != 'Open':
+        return BookingError(f"This tournament is {(status or '').lower()} and can't be booked.")
+    left = max((capacity or 0) - (sold or 0), 0)
+    return BookingError(f"Only {left} seat(s) left, you asked for {quantity}.")
+
+
+def _reserve(event_id, user_id, quantity):
+    if quantity <= 0:
+        raise BookingError("Invalid quantity.")
+    taken = _take_seats(event_id, quantity)
+    if taken is None:
+        raise _refusal(event_id, quantity)
+    if taken.status == 'Sold Out':
+        # this booking took the last seat: one fewer open event that day
+        refresh_days([day_key(taken.start_at, taken.region)])
+    _add_to_summary(user_id, quantity, taken.start_at)
+    booking = Booking(
+        order_id=Booking.new_order_id(),
+        user_id=user_id,
+        event_id=event_id,
+        quantity=quantity,
+        booked_at=datetime.utcnow(),
+        status='Confirmed',
+    )
+    db.session.add(booking)
+    return booking
+
+
+def _add_to_summary(user_id, quantity, start_at):
+    # One UPDATE in the booking's transaction. Users without a summary row
+    # yet are skipped; booking_summary() builds theirs from scratch.
+    upcoming = 1 if start_at and start_at > datetime.utcnow() else 0
+    values = {
+        'total_bookings': UserBookingSummary.total_bookings + 1,
+        'total_tickets': UserBookingSummary.total_tickets + quantity,
+    }
+    if upcoming:
+        values['upcoming_count'] = UserBookingSummary.upcoming_count + 1
+        values['upcoming_valid_until'] = db.case(
+            (db.or_(UserBookingSummary.upcoming_valid_until.is_(None),
+                    UserBookingSummary.upcoming_valid_until > start_at), start_at),
+            else_=UserBookingSummary.upcoming_valid_until,
+        )
+    db.session.execute(
+        db.update(UserBookingSummary)
+        .where(UserBookingSummary.user_id == user_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _count_upcoming(user_id, now):
+    # (upcoming bookings, earliest upcoming start) for one user
+    count, first_start = db.session.execute(
+        db.select(db.func.count(Booking.id), db.func.min(Event.start_at))
+        .join(Event, Event.id == Booking.event_id)
+        .where(Booking.user_id == user_id, Booking.status == 'Confirmed', Event.start_at > now)
+    ).one()
+    return count, first_start
+
+
+def booking_summary(user_id):
+    """The user's booking totals, building or refreshing the row if needed.
+
+    upcoming_count only goes stale when an event starts (or is moved), so it
+    is recounted once the earliest counted event's start time has passed.
+    """
+    now = datetime.utcnow()
+    summary = db.session.get(UserBookingSummary, user_id)
+    if summary is None:
+        bookings, tickets = db.session.execute(
+            db.select(db.func.count(Booking.id), db.func.coalesce(db.func.sum(Booking.quantity), 0))
+            .where(Booking.user_id == user_id, Booking.status == 'Confirmed')
+        ).one()
+        upcoming, valid_until = _count_upcoming(user_id, now)
+        db.session.execute(
+            dialect_insert(UserBookingSummary)
+            .values(user_id=user_id, total_bookings=bookings, total_tickets=tickets,
+                    upcoming_count=upcoming, upcoming_valid_until=valid_until)
+            .on_conflict_do_nothing(index_elements=['user_id'])
+        )
+        db.session.commit()
+        summary = db.session.get(UserBookingSummary, user_id)
+    elif summary.upcoming_valid_until is not None and summary.upcoming_valid_until <= now:
+        summary.upcoming_count, summary.upcoming_valid_until = _count_upcoming(user_id, now)
+        db.session.commit()
+    return summary
+
+
+def event_rescheduled(event_id):
+    """Make everyone booked on an event recount their upcoming bookings.
+
+    Runs in the caller's transaction (e.g. edit_event changing start_at).
+    """
+    db.session.execute(
+        db.update(UserBookingSummary)
+        .where(UserBookingSummary.user_id.in_(
+            db.select(Booking.user_id).where(Booking.event_id == event_id)
+        ))
+        .values(upcoming_valid_until=RECOUNT)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _is_retryable(exc):
+    message = str(exc.orig).lower() if getattr(exc, 'orig', None) else str(exc).lower()
+    return any(text in message for text in RETRYABLE_ERRORS)
+
+
+def _with_retry(work, retries, backoff):
+    # run work() and commit, retrying the whole transaction on lock contention
+    for attempt in range(retries + 1):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except OperationalError as exc:
+            db.session.rollback()
+            if attempt == retries or not _is_retryable(exc):
+                raise
+            # exponential backoff with jitter so retries don't collide again
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def book_seats(event_id, user_id, quantity, retries=5, backoff=0.01):
+    """Reserve ``quantity`` seats for one user and commit.
+
+    Raises BookingError if the event is missing, not open, or doesn't have
+    enough seats left.
+    """
+    return _with_retry(lambda: _reserve(event_id, user_id, quantity), retries, backoff)
+
+
+def book_many(requests, retries=5, backoff=0.01):
+    """Book many (event_id, user_id, quantity) requests in one transaction.
+
+    Each request succeeds or fails on its own; the returned list holds a
+    Booking or a BookingError per request, in order. All successful
+    bookings are committed together.
+    """
+    requests = list(requests)
+
+    def work():
+        results = []
+        for event_id, user_id, quantity in requests:
+            try:
+                results.append(_reserve(event_id, user_id, quantity))
+            except BookingError as exc:
+                results.append(exc)
+        return results
+
+    return _with_retry(work, retries, backoff)
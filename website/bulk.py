@@ -0,0 +1,234 @@
+# bulk.py
+# Bulk import/export of users, events and bookings as CSV or NDJSON.
+#
+#   flask export-data events -o events.ndjson
+#   flask import-data events events.ndjson --chunk 10000
+#
+# Both directions are generator pipelines, so memory stays flat whatever the
+# file size: exports stream rows off the cursor with yield_per, imports parse
+# the file lazily and insert it in chunks with one executemany per chunk.
+# Throughput goes to stderr, so "-o -" can be piped somewhere.
+import csv
+import itertools
+import json
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+
+from . import db
+from .dbutil import dialect_insert
+
+DEFAULT_CHUNK = 5000
+
+# columns that go in/out, in file order. banner_variants is left out: it's
+# derived data that "flask build-banner-variants" can render again.
+FIELDS = {
+    'users': ('id', 'name', 'email', 'password_hash'),
+    'events': ('id', 'title', 'region', 'team_size', 'mode', 'prize', 'category', 'status',
+               'start_at', 'description', 'banner', 'capacity', 'seats_sold', 'booking_count',
+               'comment_count', 'user_id', 'updated_at'),
+    'bookings': ('id', 'order_id', 'user_id', 'event_id', 'quantity', 'booked_at', 'status'),
+}
+
+
+def _model(kind):
+    from .models import User, Event, Booking
+    return {'users': User, 'events': Event, 'bookings': Booking}[kind]
+
+
+def _defaults(kind):
+    # filled in when an input row leaves a NOT NULL column out
+    from .models import Booking
+    return {
+        'events': {'status': lambda: 'Open', 'seats_sold': lambda: 0, 'booking_count': lambda: 0,
+                   'comment_count': lambda: 0, 'updated_at': datetime.utcnow},
+        'bookings': {'order_id': Booking.new_order_id, 'quantity': lambda: 1,
+                     'booked_at': datetime.utcnow, 'status': lambda: 'Confirmed'},
+    }.get(kind, {})
+
+
+def _format_of(stream, fmt):
+    if fmt:
+        return fmt
+    name = getattr(stream, 'name', '') or ''
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- export ---
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_rows(kind, chunk=DEFAULT_CHUNK):
+    """Yield every row of `kind` as a dict, streaming from the cursor."""
+    model = _model(kind)
+    columns = [getattr(model, f) for f in FIELDS[kind]]
+    result = db.session.execute(
+        db.select(*columns).order_by(model.id).execution_options(yield_per=chunk)
+    )
+    for row in result:
+        yield {f: _plain(v) for f, v in zip(FIELDS[kind], row)}
+
+
+def write_rows(rows, stream, fields, fmt):
+    """Write dict rows to `stream`; returns how many were written."""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=fields, lineterminator='\n')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps(row, ensure_ascii=False))
+            stream.write('\n')
+            count += 1
+    return count
+
+
+# --- import ---
+
+def read_rows(stream, fmt):
+    """Yield raw dict rows from a CSV or NDJSON stream."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _coercers(kind):
+    # column -> function turning a CSV string / JSON value into the column type
+    model = _model(kind)
+    coercers = {}
+    for field in FIELDS[kind]:
+        python_type = model.__table__.c[field].type.python_type
+        if python_type is datetime:
+            coercers[field] = lambda v: v if isinstance(v, datetime) else datetime.fromisoformat(v)
+        elif python_type is int:
+            coercers[field] = int
+        else:
+            coercers[field] = str
+    return coercers
+
+
+def coerce_rows(kind, rows):
+    """Turn raw rows into insert parameter dicts with one fixed set of keys.
+
+    Empty CSV cells become NULL. If the first row has no id, ids are left to
+    the database for the whole file (executemany needs uniform keys).
+    """
+    coercers = _coercers(kind)
+    defaults = _defaults(kind)
+    fields = None
+    for raw in rows:
+        if fields is None:
+            fields = [f for f in FIELDS[kind] if f != 'id' or raw.get('id') not in (None, '')]
+        row = {}
+        for field in fields:
+            value = raw.get(field)
+            if value is None or value == '':
+                row[field] = defaults[field]() if field in defaults else None
+            else:
+                row[field] = coercers[field](value)
+        yield row
+
+
+def import_rows(kind, rows, chunk=DEFAULT_CHUNK, skip_existing=False):
+    """Insert parameter dicts in chunks, one executemany + commit per chunk.
+
+    Returns the number of rows read.
+    """
+    from .search import search_index_paused
+
+    # Core insert on the table: the ORM bulk path only adds per-row overhead here
+    table = _model(kind).__table__
+    stmt = dialect_insert(table).on_conflict_do_nothing() if skip_existing else db.insert(table)
+    count = 0
+    with (search_index_paused() if kind == 'events' else nullcontext()):
+        for batch in chunked(rows, chunk):
+            db.session.connection().execute(stmt, batch)
+            db.session.commit()
+            count += len(batch)
+    _after_import(kind)
+    return count
+
+
+def _after_import(kind):
+    from .availability import rebuild_day_summaries
+    from .models import UserBookingSummary
+
+    if db.engine.dialect.name == 'postgresql':
+        # explicit ids don't advance the serial sequence
+        table = _model(kind).__tablename__
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+            f"coalesce((SELECT max(id) FROM \"{table}\"), 1))"
+        ))
+    if kind == 'bookings':
+        # per-user totals are rebuilt lazily by booking_summary()
+        db.session.execute(db.delete(UserBookingSummary))
+    db.session.commit()
+    if kind == 'events':
+        rebuild_day_summaries()
+
+
+def _report(action, kind, count, elapsed):
+    rate = count / elapsed if elapsed else float('inf')
+    click.echo(f"{action} {count} {kind} in {elapsed:.2f}s ({rate:,.0f} rows/s)", err=True)
+
+
+@click.command('export-data')
+@click.argument('kind', type=click.Choice(sorted(FIELDS)))
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-',
+              help="File to write (default stdout).")
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help="Defaults to the output file's extension, else ndjson.")
+@click.option('--chunk', default=DEFAULT_CHUNK, show_default=True, help="Rows fetched per round-trip.")
+@with_appcontext
+def export_data_command(kind, output, fmt, chunk):
+    """Stream all users, events or bookings to CSV/NDJSON."""
+    start = time.perf_counter()
+    count = write_rows(export_rows(kind, chunk), output, FIELDS[kind], _format_of(output, fmt))
+    output.flush()
+    _report('Exported', kind, count, time.perf_counter() - start)
+
+
+@click.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(FIELDS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help="Defaults to the file's extension, else ndjson.")
+@click.option('--chunk', default=DEFAULT_CHUNK, show_default=True, help="Rows per INSERT batch.")
+@click.option('--skip-existing', is_flag=True, help="Ignore rows that clash with an existing key.")
+@with_appcontext
+def import_data_command(kind, source, fmt, chunk, skip_existing):
+    """Bulk-load users, events or bookings from CSV/NDJSON (use - for stdin).
+
+    Counters such as Event.seats_sold are taken from the file as-is; run
+    "flask reconcile-counters" after loading bookings on their own.
+    """
+    start = time.perf_counter()
+    rows = coerce_rows(kind, read_rows(source, _format_of(source, fmt)))
+    count = import_rows(kind, rows, chunk, skip_existing)
+    _report('Imported', kind, count, time.perf_counter() - start)
+
+
+def init_bulk(app):
+    app.cli.add_command(export_data_command)
+    app.cli.add_command(import_data_command)
@@ -0,0 +1,112 @@
+# cache.py
+# Fragment cache for event pages. Entries are keyed by event id plus the
+# event's updated_at, read with a primary-key lookup on every request. Every
+# write to an event bumps updated_at (see models.Event), so readers in any
+# worker never pick up a fragment rendered before the write, and old versions
+# just age out of the LRU.
+#
+# The LRU lives in-process. Set EVENT_CACHE_SHARED to a backend with
+# get/set/delete (e.g. a thin Redis wrapper, or DictBackend locally) and the
+# fragments are shared between workers as well.
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from . import db
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry TTL (seconds)."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DictBackend(LRUCache):
+    """Local stand-in for a shared cache server (same get/set/delete)."""
+
+    def __init__(self, ttl=300):
+        super().__init__(maxsize=float('inf'), ttl=ttl)
+
+
+class FragmentCache:
+    """Versioned fragment cache: local LRU in front of an optional shared backend."""
+
+    def __init__(self, maxsize=1024, ttl=60, shared=None):
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.shared = shared
+        self.ttl = ttl
+
+    def version(self, event_id):
+        # None for a missing event; its key then just never gets a hit
+        from .models import Event
+
+        stamp = db.session.scalar(db.select(Event.updated_at).where(Event.id == event_id))
+        return stamp.isoformat() if stamp else None
+
+    def key(self, event_id, name='page'):
+        return f'event:{event_id}:v{self.version(event_id)}:{name}'
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value, self.ttl)
+
+
+def init_cache(app):
+    app.config.setdefault('EVENT_CACHE_SIZE', 1024)
+    app.config.setdefault('EVENT_CACHE_TTL', 60)
+    app.config.setdefault('EVENT_CACHE_SHARED', None)
+    app.extensions['event_cache'] = FragmentCache(
+        maxsize=app.config['EVENT_CACHE_SIZE'],
+        ttl=app.config['EVENT_CACHE_TTL'],
+        shared=app.config['EVENT_CACHE_SHARED'],
+    )
+
+
+def event_cache():
+    return current_app.extensions['event_cache']
@@ -0,0 +1,186 @@
+# comments.py
+# Posting comments, synchronously or through a write-behind queue.
+#
+# By default add_comment inserts the comment and bumps Event.comment_count
+# in its own transaction, like any other write. With COMMENT_WRITE_BEHIND on,
+# comments go into an in-process queue instead and a background thread
+# writes whatever has piled up in one transaction: one executemany INSERT
+# plus one counter UPDATE per event. A burst of comments then costs a
+# handful of short write transactions instead of one each.
+#
+#   COMMENT_WRITE_BEHIND  off by default
+#   COMMENT_FLUSH_MS      how long a flush waits to gather more comments
+#                         after the first one arrives (default 5)
+#   COMMENT_BATCH_SIZE    flush straight away once this many are queued,
+#                         and never write more per transaction (default 200)
+#   COMMENT_QUEUE_MAX     above this many queued, posts fall back to a
+#                         synchronous write (default 10000)
+#
+# The trade-off: a queued comment shows up a few ms after the redirect
+# rather than before it, and comments still queued when a worker is killed
+# outright are lost (a normal exit flushes them). Queue depth and flush
+# latency are on /_metrics.
+import atexit
+import collections
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .models import Event, Comment
+
+_comment = Comment.__table__
+_event = Event.__table__
+_bump_count = (
+    db.update(_event)
+    .where(_event.c.id == db.bindparam('event_id'))
+    .values(comment_count=_event.c.comment_count + db.bindparam('added'))
+)
+
+
+def _write(rows):
+    # one transaction for any number of comments
+    added = collections.Counter(row['event_id'] for row in rows)
+    connection = db.session.connection()
+    connection.execute(_comment.insert(), rows)
+    connection.execute(_bump_count, [{'event_id': e, 'added': n} for e, n in added.items()])
+    db.session.commit()
+    return added
+
+
+class CommentWriter:
+    """Write-behind queue for comments, flushed by one thread per process."""
+
+    def __init__(self, app, flush_ms, batch_size, max_queued):
+        self.app = app
+        self.interval = flush_ms / 1000
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self._queue = collections.deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = threading.Event()
+        self._full = threading.Event()
+        self._thread = None
+        self.stats = {'flushes': 0, 'rows': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'errors': 0, 'overflow': 0}
+
+    def submit(self, row):
+        """Queue one comment row; False if the queue is full."""
+        with self._lock:
+            if len(self._queue) >= self.max_queued:
+                self.stats['overflow'] += 1
+                return False
+            self._queue.append(row)
+            depth = len(self._queue)
+            if self._thread is None:
+                # started on first use, so each (forked) worker gets its own
+                self._thread = threading.Thread(target=self._run, name='comment-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        self._pending.set()
+        if depth >= self.batch_size:
+            self._full.set()
+        return True
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            # gather for a moment unless a full batch is already waiting
+            self._full.wait(self.interval)
+            self._pending.clear()
+            self._full.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far; returns how many comments were written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return written
+                done = self._flush_batch(batch)
+                if done is None:
+                    return written
+                written += done
+
+    def _flush_batch(self, batch):
+        # returns how many were written, or None to stop flushing for now
+        start = time.perf_counter()
+        with self.app.app_context():
+            try:
+                _write(batch)
+            except OperationalError as e:
+                # e.g. "database is locked": put them back for the next pass
+                db.session.rollback()
+                with self._lock:
+                    self._queue.extendleft(reversed(batch))
+                    self.stats['errors'] += 1
+                self._pending.set()
+                self.app.logger.warning("comment flush of %d deferred: %s", len(batch), e)
+                return None
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    self.stats['errors'] += 1
+                self.app.logger.exception("comment flush failed; dropped %d comment(s)", len(batch))
+                return 0
+            finally:
+                db.session.remove()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats['flushes'] += 1
+            self.stats['rows'] += len(batch)
+            self.stats['seconds'] += elapsed
+            self.stats['max_seconds'] = max(self.stats['max_seconds'], elapsed)
+        return len(batch)
+
+    METRICS = (
+        ('app_comment_queue_depth', 'gauge', 'Comments waiting to be written.', None),
+        ('app_comment_flushes_total', 'counter', 'Write-behind flush transactions.', 'flushes'),
+        ('app_comment_flushed_total', 'counter', 'Comments written by the write-behind queue.', 'rows'),
+        ('app_comment_flush_seconds_total', 'counter', 'Time spent in write-behind flushes.', 'seconds'),
+        ('app_comment_flush_seconds_max', 'gauge', 'Slowest write-behind flush so far.', 'max_seconds'),
+        ('app_comment_flush_errors_total', 'counter', 'Flushes that failed or were deferred.', 'errors'),
+        ('app_comment_queue_overflow_total', 'counter', 'Comments written synchronously because the queue was full.',
+         'overflow'),
+    )
+
+    def render_metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+            depth = len(self._queue)
+        lines = []
+        for name, kind, help_text, key in self.METRICS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {depth if key is None else stats[key]}")
+        return "\n".join(lines) + "\n"
+
+
+def post_comment(event_id, author, body):
+    """Save a comment: queued if write-behind is on, else right away."""
+    row = {'event_id': event_id, 'author': author, 'body': body, 'created_at': datetime.utcnow()}
+    writer = current_app.extensions.get('comment_writer')
+    if writer is not None and writer.submit(row):
+        return
+    _write([row])
+
+
+def init_comments(app):
+    from .instrumentation import add_metrics_collector
+
+    app.config.setdefault('COMMENT_WRITE_BEHIND', False)
+    app.config.setdefault('COMMENT_FLUSH_MS', 5)
+    app.config.setdefault('COMMENT_BATCH_SIZE', 200)
+    app.config.setdefault('COMMENT_QUEUE_MAX', 10000)
+    if not app.config['COMMENT_WRITE_BEHIND']:
+        return
+    writer = CommentWriter(app, app.config['COMMENT_FLUSH_MS'], app.config['COMMENT_BATCH_SIZE'],
+                           app.config['COMMENT_QUEUE_MAX'])
+    app.extensions['comment_writer'] = writer
+    add_metrics_collector(app, writer.render_metrics)
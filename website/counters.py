@@ -0,0 +1,100 @@
+# counters.py
+# Repair for the denormalized counters the pages read instead of COUNT(*):
+#
+#   Event.booking_count / seats_sold   bumped by booking.py's seat UPDATE
+#   Event.comment_count                bumped by add_comment
+#   UserBookingSummary                 kept up to date by booking.py
+#
+# They're maintained in the same transaction as the write they count, so
+# they only drift when rows are changed behind the app's back (bulk
+# imports, manual SQL, restores). "flask reconcile-counters" recomputes
+# them: events are walked in id batches with one grouped query per table,
+# and only rows whose stored values are wrong get written, so updated_at
+# (and the API's ETags) only change for events that actually moved. Each
+# write is conditional on the values it read, so a booking or comment that
+# lands mid-run is never overwritten with a stale count (that event is just
+# left for the next run).
+import click
+from flask.cli import with_appcontext
+
+from . import db
+from .models import Event, Booking, Comment, UserBookingSummary
+
+DEFAULT_BATCH = 2000
+
+_event = Event.__table__
+_fix = (
+    db.update(_event)
+    .where(_event.c.id == db.bindparam('event_id'),
+           _event.c.booking_count == db.bindparam('old_bookings'),
+           _event.c.seats_sold == db.bindparam('old_tickets'),
+           _event.c.comment_count == db.bindparam('old_comments'))
+    .values(booking_count=db.bindparam('bookings'), seats_sold=db.bindparam('tickets'),
+            comment_count=db.bindparam('comments'))
+)
+
+
+def _actual_counts(lo, hi):
+    # {event_id: (bookings, tickets)} and {event_id: comments} for an id range
+    bookings = db.session.execute(
+        db.select(Booking.event_id, db.func.count(Booking.id), db.func.sum(Booking.quantity))
+        .where(Booking.event_id.between(lo, hi), Booking.status == 'Confirmed')
+        .group_by(Booking.event_id)
+    ).all()
+    comments = db.session.execute(
+        db.select(Comment.event_id, db.func.count(Comment.id))
+        .where(Comment.event_id.between(lo, hi))
+        .group_by(Comment.event_id)
+    ).all()
+    return ({event_id: (n, int(tickets or 0)) for event_id, n, tickets in bookings},
+            dict(comments))
+
+
+def reconcile_counters(batch_size=DEFAULT_BATCH):
+    """Recompute every event's counters; returns the ids that were wrong.
+
+    Per-user booking summaries are dropped and rebuilt lazily by
+    booking_summary() on their next read.
+    """
+    fixed = []
+    last_id = 0
+    while True:
+        stored = db.session.execute(
+            db.select(Event.id, Event.booking_count, Event.seats_sold, Event.comment_count)
+            .where(Event.id > last_id)
+            .order_by(Event.id)
+            .limit(batch_size)
+        ).all()
+        if not stored:
+            break
+        last_id = stored[-1].id
+        bookings, comments = _actual_counts(stored[0].id, last_id)
+        changes = []
+        for event_id, booking_count, seats_sold, comment_count in stored:
+            n, tickets = bookings.get(event_id, (0, 0))
+            c = comments.get(event_id, 0)
+            if (booking_count, seats_sold, comment_count) != (n, tickets, c):
+                changes.append({'event_id': event_id, 'bookings': n, 'tickets': tickets, 'comments': c,
+                                'old_bookings': booking_count, 'old_tickets': seats_sold,
+                                'old_comments': comment_count})
+        if changes:
+            db.session.connection().execute(_fix, changes)
+        db.session.commit()  # one short write transaction per batch
+        fixed.extend(change['event_id'] for change in changes)
+
+    db.session.execute(db.delete(UserBookingSummary))
+    db.session.commit()
+    return fixed
+
+
+@click.command('reconcile-counters')
+@click.option('--batch', default=DEFAULT_BATCH, show_default=True, help="Events per transaction.")
+@with_appcontext
+def reconcile_counters_command(batch):
+    """Recompute event booking/seat/comment counters and booking summaries."""
+    fixed = reconcile_counters(batch)
+    click.echo(f"Fixed counters on {len(fixed)} event(s).")
+
+
+def init_counters(app):
+    app.cli.add_command(reconcile_counters_command)
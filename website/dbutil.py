@@ -0,0 +1,28 @@
+# dbutil.py
+# Small helpers for the few statements that differ between SQLite and PostgreSQL.
+import re
+
+from . import db
+
+
+def dialect_insert(model):
+    """insert() with on_conflict_do_nothing/on_conflict_do_update for the current engine."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def unique_violation(exc, table):
+    """Column whose unique constraint an IntegrityError tripped, or None.
+
+    Read from the driver's message so no follow-up query is needed:
+    SQLite says "UNIQUE constraint failed: user.email", PostgreSQL names the
+    constraint ("user_email_key") and the key ("Key (email)=(...)").
+    """
+    message = str(getattr(exc, 'orig', exc))
+    match = (re.search(rf'UNIQUE constraint failed: "?{table}"?\.(\w+)', message)
+             or re.search(r'Key \((\w+)\)=', message)
+             or re.search(rf'"{table}_(\w+)_key"', message))
+    return match.group(1) if match else None
@@ -91,6 +91,8 @@ class EventForm(FlaskForm):
 
     prize = StringField("Prize Pool", validators=[Optional(), Length(max=64)])
 
+    capacity = IntegerField("Capacity (seats)", validators=[Optional(), NumberRange(min=1, max=100000)])
+
     description = TextAreaField("Description & Format", validators=[Length(max=2000)])
 
     # Banner (either upload or URL)
@@ -0,0 +1,172 @@
+# instrumentation.py
+# Hooks on the SQLAlchemy engine for counting and profiling statements.
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import (
+    g, has_request_context, request, request_started, request_tearing_down, abort, Response, current_app,
+)
+from sqlalchemy import event as sa_event
+
+from . import db
+
+LOCAL_ADDRS = ('127.0.0.1', '::1')
+
+
+class QueryCounter:
+    """Collects the SQL statements run while it is active."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Count statements on the app's engine inside a ``with`` block.
+
+        with count_queries() as counter:
+            client.get('/')
+        assert counter.count <= 3
+    """
+    engine = engine or db.engine
+    counter = QueryCounter()
+    sa_event.listen(engine, 'before_cursor_execute', counter._before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        sa_event.remove(engine, 'before_cursor_execute', counter._before_cursor_execute)
+
+
+def assert_constant_queries(run, seed, sizes=(1, 10), engine=None):
+    """Fail if the statements issued by ``run()`` grow with the row count.
+
+    ``seed(n)`` should bring the data up to ``n`` rows before each run.
+    benchmarks/query_counts.py runs it over the list pages to catch N+1
+    lazy loads.
+    """
+    counts = []
+    for size in sizes:
+        seed(size)
+        with count_queries(engine) as counter:
+            run()
+        counts.append(counter.count)
+    if len(set(counts)) != 1:
+        raise AssertionError(
+            f"statement count grows with rows: {dict(zip(sizes, counts))}"
+        )
+    return counts[0]
+
+
+class SQLProfiler:
+    """Opt-in per-endpoint SQL and wall-time profiling.
+
+    Enabled with ``SQL_PROFILING``; statements slower than
+    ``SQL_SLOW_QUERY_MS`` are logged with their bound parameters.
+    Totals are served in Prometheus text format at ``/_metrics``
+    (loopback clients only, see add_metrics_collector).
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        # endpoint -> [requests, statements, db_seconds, wall_seconds, slow]
+        self.stats = {}
+        self.slow_ms = 100
+        self.logger = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('SQL_PROFILING'):
+            return
+        self.slow_ms = float(app.config.get('SQL_SLOW_QUERY_MS', 100))
+        self.logger = app.logger
+
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        sa_event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        request_started.connect(self._request_started, app)
+        request_tearing_down.connect(self._request_tearing_down, app)
+
+        app.extensions['sql_profiler'] = self
+        add_metrics_collector(app, self.render_metrics)
+
+    # --- engine events ---
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        slow = elapsed * 1000 >= self.slow_ms
+        if slow:
+            self.logger.warning("slow query (%.1f ms): %s | params=%r", elapsed * 1000, statement, parameters)
+        if has_request_context() and '_sql_profile' in g:
+            profile = g._sql_profile
+            profile['statements'] += 1
+            profile['db_time'] += elapsed
+            profile['slow'] += int(slow)
+
+    # --- request signals ---
+    def _request_started(self, sender, **extra):
+        g._sql_profile = {'start': time.perf_counter(), 'statements': 0, 'db_time': 0.0, 'slow': 0}
+
+    def _request_tearing_down(self, sender, **extra):
+        profile = g.pop('_sql_profile', None)
+        if profile is None or request.endpoint == 'metrics':
+            return
+        wall = time.perf_counter() - profile['start']
+        endpoint = request.endpoint or 'unknown'
+        with self._lock:
+            row = self.stats.setdefault(endpoint, [0, 0, 0.0, 0.0, 0])
+            row[0] += 1
+            row[1] += profile['statements']
+            row[2] += profile['db_time']
+            row[3] += wall
+            row[4] += profile['slow']
+
+    # --- exposition ---
+    METRICS = (
+        ('app_requests_total', 'counter', 'Requests handled.'),
+        ('app_db_statements_total', 'counter', 'SQL statements executed.'),
+        ('app_db_seconds_total', 'counter', 'Time spent executing SQL.'),
+        ('app_request_seconds_total', 'counter', 'Wall time spent handling requests.'),
+        ('app_db_slow_statements_total', 'counter', 'Statements over the slow query threshold.'),
+    )
+
+    def render_metrics(self):
+        with self._lock:
+            snapshot = {endpoint: list(row) for endpoint, row in self.stats.items()}
+        lines = []
+        for i, (name, kind, help_text) in enumerate(self.METRICS):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for endpoint, row in sorted(snapshot.items()):
+                label = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{name}{{endpoint="{label}"}} {row[i]}')
+        return "\n".join(lines) + "\n"
+
+
+def add_metrics_collector(app, render):
+    """Serve ``render()`` (Prometheus text lines) as part of ``/_metrics``.
+
+    The route is added with the first collector, so an app with nothing to
+    report doesn't have it.
+    """
+    app.extensions.setdefault('metrics_collectors', []).append(render)
+    if 'metrics' not in app.view_functions:
+        app.add_url_rule('/_metrics', 'metrics', metrics_view)
+
+
+def metrics_view():
+    if request.remote_addr not in LOCAL_ADDRS:
+        abort(404)
+    body = "".join(render() for render in current_app.extensions['metrics_collectors'])
+    return Response(body, mimetype='text/plain; version=0.0.4')
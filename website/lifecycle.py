@@ -0,0 +1,130 @@
+# lifecycle.py
+# Moves events along Open/Sold Out -> Live -> Completed by start_at, so list
+# queries can filter on status instead of wading through past tournaments.
+#
+# Each step is a batch of conditional UPDATEs that walk ix_event_status_start_at
+# (status, start_at, id). The WHERE clause repeats the transition's
+# precondition, so a pass is idempotent: running it twice, or from every web
+# worker at once, can only ever apply each transition one time.
+#
+#   EVENT_LIVE_HOURS           how long an event counts as Live (default 6)
+#   STATUS_BATCH_SIZE          rows per UPDATE/transaction (default 500)
+#   STATUS_SCHEDULER_INTERVAL  seconds between passes in each web worker;
+#                              0 disables the thread ("flask advance-event-status"
+#                              from cron does the same job)
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .availability import day_key, refresh_days
+from .models import Event
+
+BOOKABLE = ('Open', 'Sold Out')
+# (from statuses, to status, how long after start_at)
+TRANSITIONS = (
+    (BOOKABLE, 'Live', lambda app: timedelta(0)),
+    (('Live',), 'Completed', lambda app: timedelta(hours=app.config['EVENT_LIVE_HOURS'])),
+)
+
+
+def _advance_batch(from_statuses, to_status, cutoff, batch_size):
+    # ids picked by an index range scan, then re-checked by the UPDATE itself
+    # in case another worker got there first
+    due = (
+        db.select(Event.id)
+        .where(Event.status.in_(from_statuses), Event.start_at <= cutoff)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        db.update(Event)
+        .where(Event.id.in_(due), Event.status.in_(from_statuses), Event.start_at <= cutoff)
+        .values(status=to_status)
+        .returning(Event.id, Event.start_at, Event.region)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    refresh_days(day_key(row.start_at, row.region) for row in rows)
+    db.session.commit()
+    return [row.id for row in rows]
+
+
+def advance_event_status(now=None):
+    """Apply every due status transition. Returns {to_status: count}."""
+    app = current_app
+    now = now or datetime.utcnow()
+    batch_size = app.config['STATUS_BATCH_SIZE']
+    counts = {}
+    for from_statuses, to_status, delay in TRANSITIONS:
+        cutoff = now - delay(app)
+        moved = 0
+        while True:
+            ids = _advance_batch(from_statuses, to_status, cutoff, batch_size)
+            moved += len(ids)
+            if len(ids) < batch_size:
+                break
+        counts[to_status] = moved
+    return counts
+
+
+def _scheduler_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                advance_event_status()
+            except OperationalError as e:
+                # e.g. "database is locked"; nothing half-done, next pass retries
+                db.session.rollback()
+                app.logger.warning("event status pass skipped: %s", e)
+            except Exception:
+                # anything else is a bug, but the thread must outlive it or
+                # this worker stops advancing statuses until it restarts
+                db.session.rollback()
+                app.logger.exception("event status pass failed")
+            finally:
+                db.session.remove()
+
+
+def start_scheduler(app):
+    """Start this process's scheduler thread (once)."""
+    interval = app.config['STATUS_SCHEDULER_INTERVAL']
+    with app.extensions['status_scheduler_lock']:
+        if 'status_scheduler' in app.extensions:
+            return
+        if interval <= 0:
+            app.extensions['status_scheduler'] = None
+            return
+        thread = threading.Thread(target=_scheduler_loop, args=(app, interval),
+                                  name='event-status', daemon=True)
+        app.extensions['status_scheduler'] = thread
+        thread.start()
+
+
+@click.command('advance-event-status')
+@with_appcontext
+def advance_event_status_command():
+    """Move due events to Live / Completed (safe to run from cron)."""
+    counts = advance_event_status()
+    click.echo(", ".join(f"{n} -> {status}" for status, n in counts.items()))
+
+
+def init_lifecycle(app):
+    app.config.setdefault('EVENT_LIVE_HOURS', 6)
+    app.config.setdefault('STATUS_BATCH_SIZE', 500)
+    app.config.setdefault('STATUS_SCHEDULER_INTERVAL', 60)
+    app.extensions['status_scheduler_lock'] = threading.Lock()
+    app.cli.add_command(advance_event_status_command)
+
+    # started by the first request rather than here, so CLI commands and
+    # scripts that only build the app don't spawn it
+    @app.before_request
+    def _ensure_scheduler():
+        if 'status_scheduler' not in app.extensions:
+            start_scheduler(app)
@@ -0,0 +1,346 @@
+# media.py
+# Banner upload pipeline. Uploads are streamed to disk in chunks and stored
+# content-addressed: the file name is the SHA-256 of its bytes, so the same
+# image uploaded twice is stored once and two "banner.png"s never collide.
+# A background worker pool renders resized WebP/JPEG variants next to the
+# original and records them on Event.banner_variants for srcset.
+#
+# Stored files never change, so /media/<name> serves them with a strong ETag
+# (the digest) and "Cache-Control: immutable". MediaBlob keeps a reference
+# count from Event.banner; "flask media-gc" removes blobs nothing points at.
+#
+# Pillow is needed for the variants; without it uploads still work and the
+# templates fall back to the original file.
+import hashlib
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import Blueprint, abort, current_app, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+from . import db
+from .assets import static_url
+from .dbutil import dialect_insert
+
+CHUNK_SIZE = 64 * 1024
+
+# name -> target width in px (never upscaled)
+VARIANT_WIDTHS = {'thumb': 320, 'card': 640, 'hero': 1280}
+VARIANT_FORMATS = {'webp': ('WEBP', 'webp'), 'jpeg': ('JPEG', 'jpg')}
+VARIANT_QUALITY = 80
+
+ALLOWED_EXTENSIONS = {'jpg': 'jpg', 'jpeg': 'jpg', 'png': 'png'}
+MEDIA_PREFIX = 'media/'   # Event.banner values served by media_bp
+ONE_YEAR = 365 * 24 * 3600
+
+DEFAULT_BANNER = 'img/event2.png'
+
+media_bp = Blueprint('media', __name__)
+
+
+def upload_dir(app=None):
+    app = app or current_app
+    return os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+
+
+def blob_path(name, app=None):
+    # <UPLOAD_FOLDER>/ab/abcdef....png: fan out so no directory gets huge
+    return os.path.join(upload_dir(app), name[:2], name)
+
+
+def save_upload(file_storage):
+    """Stream an upload into the content-addressed store.
+
+    Returns the Event.banner value ("media/<sha256>.<ext>"). The MediaBlob
+    row is created with refcount 0; set_banner() takes the reference.
+    """
+    ext = os.path.splitext(file_storage.filename or '')[1].lower().lstrip('.')
+    ext = ALLOWED_EXTENSIONS.get(ext, 'png')
+    root = upload_dir()
+    os.makedirs(root, exist_ok=True)
+
+    # hash while writing to a temp name, so a half-written file is never served
+    digest = hashlib.sha256()
+    size = 0
+    tmp = os.path.join(root, f'.{uuid.uuid4().hex}.part')
+    try:
+        with open(tmp, 'wb') as out:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        name = f'{digest.hexdigest()}.{ext}'
+        # row first: once it's written, media-gc can't delete this blob until
+        # our transaction ends. The file is put in place even if it already
+        # exists, in case a GC that got in first is removing the old copy.
+        _ensure_blob(name, size)
+        dest = blob_path(name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return MEDIA_PREFIX + name
+
+
+def _ensure_blob(name, size):
+    from .models import MediaBlob
+
+    digest, ext = name.split('.', 1)
+    # re-uploading an orphan restarts its grace period
+    stmt = dialect_insert(MediaBlob).values(
+        digest=digest, ext=ext, size=size, refcount=0, created_at=datetime.utcnow()
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['digest'], set_={'created_at': stmt.excluded.created_at},
+    ))
+
+
+def _adjust_refcount(banner, delta):
+    from .models import MediaBlob
+
+    if not is_media(banner):
+        return
+    digest = banner[len(MEDIA_PREFIX):].split('.', 1)[0]
+    db.session.execute(
+        db.update(MediaBlob)
+        .where(MediaBlob.digest == digest)
+        .values(refcount=MediaBlob.refcount + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def set_banner(event, banner):
+    """Point an event at a new banner, moving the blob reference counts.
+
+    Runs in the caller's transaction. Returns True if the banner changed.
+    """
+    if banner == event.banner:
+        return False
+    _adjust_refcount(event.banner, -1)
+    _adjust_refcount(banner, +1)
+    event.banner = banner
+    event.banner_variants = None
+    return True
+
+
+def make_variants(src_abs, out_dir):
+    """Render every size/format variant of an image. Returns the variant map
+    with absolute paths, or {} if Pillow isn't installed."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return {}
+
+    stem = os.path.splitext(os.path.basename(src_abs))[0]
+    variants = {}
+    with Image.open(src_abs) as img:
+        img = img.convert('RGB')
+        for name, width in VARIANT_WIDTHS.items():
+            if img.width > width:
+                resized = img.resize((width, max(1, round(width * img.height / img.width))), Image.LANCZOS)
+            else:
+                resized = img
+            entry = {'width': resized.width}
+            for fmt, (pil_format, ext) in VARIANT_FORMATS.items():
+                path = os.path.join(out_dir, f'{stem}-{name}.{ext}')
+                # content-addressed variants already rendered for a duplicate upload
+                if not os.path.exists(path):
+                    tmp = f'{path}.{uuid.uuid4().hex}.part'
+                    resized.save(tmp, pil_format, quality=VARIANT_QUALITY, optimize=True)
+                    os.replace(tmp, path)
+                entry[fmt] = path
+            variants[name] = entry
+    return variants
+
+
+def _build_variants(app, event_id, banner):
+    from .models import Event
+
+    with app.app_context():
+        src_abs = local_file(banner, app)
+        try:
+            variants = make_variants(src_abs, os.path.dirname(src_abs))
+        except OSError as e:
+            app.logger.warning("banner variants failed for event %s: %s", event_id, e)
+            return
+        if not variants:
+            return
+        for entry in variants.values():
+            for fmt in VARIANT_FORMATS:
+                entry[fmt] = stored_name(app, entry[fmt])
+
+        # only attach if the banner hasn't been replaced in the meantime
+        db.session.execute(
+            db.update(Event)
+            .where(Event.id == event_id, Event.banner == banner)
+            .values(banner_variants=variants)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        db.session.remove()
+
+
+def queue_variants(event_id, banner):
+    """Render variants for an uploaded banner on the background pool."""
+    app = current_app._get_current_object()
+    return app.extensions['image_pool'].submit(_build_variants, app, event_id, banner)
+
+
+def is_local(banner):
+    return bool(banner) and not banner.startswith(('http://', 'https://', '//'))
+
+
+def is_media(banner):
+    return bool(banner) and banner.startswith(MEDIA_PREFIX)
+
+
+def local_file(stored, app=None):
+    # absolute path for a stored banner/variant value
+    app = app or current_app
+    if is_media(stored):
+        return blob_path(stored[len(MEDIA_PREFIX):], app)
+    return os.path.join(app.static_folder, stored)
+
+
+def stored_name(app, abs_path):
+    # inverse of local_file for files we wrote
+    if abs_path.startswith(upload_dir(app) + os.sep):
+        return MEDIA_PREFIX + os.path.basename(abs_path)
+    return os.path.relpath(abs_path, app.static_folder).replace(os.sep, '/')
+
+
+def stored_url(stored):
+    if is_media(stored):
+        return url_for('media.serve', name=stored[len(MEDIA_PREFIX):])
+    return static_url(stored)
+
+
+def _get(obj, name):
+    # events may be ORM rows or the cached page dicts from event_details
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def banner_url(event, variant=None, fmt='jpeg'):
+    banner = _get(event, 'banner')
+    if not banner:
+        return static_url(DEFAULT_BANNER)
+    if not is_local(banner):
+        return banner
+    variants = _get(event, 'banner_variants') or {}
+    if variant in variants:
+        return stored_url(variants[variant][fmt])
+    return stored_url(banner)
+
+
+def banner_srcset(event, fmt='jpeg'):
+    # "url 320w, url 640w, ..." or '' when there are no variants yet
+    variants = _get(event, 'banner_variants') or {}
+    # small originals aren't upscaled, so several sizes can share a width
+    by_width = {entry['width']: entry for entry in variants.values()}
+    return ', '.join(f"{stored_url(by_width[w][fmt])} {w}w" for w in sorted(by_width))
+
+
+@click.command('build-banner-variants')
+@with_appcontext
+def build_banner_variants_command():
+    """Render missing variants for events with a local banner."""
+    from .models import Event
+
+    app = current_app._get_current_object()
+    events = db.session.execute(
+        db.select(Event.id, Event.banner).where(Event.banner.is_not(None), Event.banner_variants.is_(None))
+    ).all()
+    queued = [(event_id, banner) for event_id, banner in events
+              if is_local(banner) and os.path.exists(local_file(banner, app))]
+    for future in [queue_variants(event_id, banner) for event_id, banner in queued]:
+        future.result()
+    click.echo(f"Rendered variants for {len(queued)} event(s).")
+
+
+@media_bp.route('/media/<name>')
+def serve(name):
+    # names are "<sha256>.<ext>" or "<sha256>-<variant>.<ext>"; the digest
+    # is a strong validator and the bytes can never change
+    digest = name.split('.', 1)[0].split('-', 1)[0]
+    if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest):
+        abort(404)
+    response = send_from_directory(
+        os.path.join(upload_dir(), name[:2]), name,
+        max_age=ONE_YEAR, etag=name.split('.', 1)[0],
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@click.command('media-gc')
+@click.option('--grace', default=3600, show_default=True,
+              help="Seconds an unreferenced blob is kept (covers in-flight uploads).")
+@with_appcontext
+def media_gc_command(grace):
+    """Recount banner references and delete unreferenced blobs."""
+    from .models import Event, MediaBlob
+
+    # Event.banner is the source of truth; fix any drift in the counters first
+    counts = dict(db.session.execute(
+        db.select(Event.banner, db.func.count(Event.id))
+        .where(Event.banner.like(MEDIA_PREFIX + '%'))
+        .group_by(Event.banner)
+    ).all())
+    refs = {banner[len(MEDIA_PREFIX):].split('.', 1)[0]: n for banner, n in counts.items()}
+    for blob in db.session.execute(db.select(MediaBlob)).scalars():
+        blob.refcount = refs.get(blob.digest, 0)
+    db.session.commit()
+
+    # the DELETE re-checks refcount/created_at itself, and files are only
+    # unlinked for rows it actually removed, before the commit: an upload
+    # re-using one of these blobs waits on our write and then puts its file
+    # back, instead of us deleting a file it already relies on
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    orphans = db.session.execute(
+        db.delete(MediaBlob)
+        .where(MediaBlob.refcount <= 0, MediaBlob.created_at < cutoff)
+        .returning(MediaBlob.digest)
+    ).scalars().all()
+    removed = 0
+    for digest in orphans:
+        folder = os.path.dirname(blob_path(digest))
+        if os.path.isdir(folder):
+            for filename in os.listdir(folder):
+                if filename.startswith(digest):
+                    os.remove(os.path.join(folder, filename))
+                    removed += 1
+    db.session.commit()
+
+    # files left behind without a row (e.g. a crash between write and insert)
+    known = set(db.session.execute(db.select(MediaBlob.digest)).scalars())
+    root = upload_dir()
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            digest = filename.split('.', 1)[0].split('-', 1)[0]
+            if (len(digest) == 64 and digest not in known
+                    and os.path.getmtime(path) < time.time() - grace):
+                os.remove(path)
+                removed += 1
+    click.echo(f"Removed {len(orphans)} orphaned blob(s), {removed} file(s).")
+
+
+def init_media(app):
+    app.config.setdefault('IMAGE_WORKERS', 2)
+    app.extensions['image_pool'] = ThreadPoolExecutor(
+        max_workers=app.config['IMAGE_WORKERS'], thread_name_prefix='banner-variants'
+    )
+    app.add_template_global(banner_url)
+    app.add_template_global(banner_srcset)
+    app.cli.add_command(build_banner_variants_command)
+    app.cli.add_command(media_gc_command)
+    app.register_blueprint(media_bp)
@@ -0,0 +1,223 @@
+# migrations.py
+# Explicit, ordered schema changes, run once per deploy instead of
+# create_all() in every worker on every boot:
+#
+#   flask db upgrade     apply whatever is pending
+#   flask db status      list applied / pending migrations
+#
+# Applied names are recorded in schema_migrations. 0001 creates any missing
+# table as the models describe it, so a fresh database is current straight
+# away; the steps after it bring databases created by older versions of the
+# app up to date. Every step checks before it alters, so re-running one (or
+# two workers racing in development, where AUTO_MIGRATE applies them in
+# create_app) is harmless.
+#
+# New schema changes go at the end of the list with the next number; never
+# edit or reorder one that has shipped.
+from datetime import datetime
+
+import click
+import sqlalchemy as sa
+from flask.cli import AppGroup
+
+from . import db
+from .dbutil import dialect_insert
+
+MIGRATIONS = []
+_EPOCH = '1970-01-01 00:00:00'
+
+schema_migrations = sa.Table(
+    'schema_migrations', sa.MetaData(),
+    sa.Column('name', sa.String(64), primary_key=True),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+)
+
+
+def migration(name):
+    def register(fn):
+        MIGRATIONS.append((name, fn))
+        return fn
+    return register
+
+
+def _columns(table):
+    return {c['name'] for c in sa.inspect(db.session.connection()).get_columns(table)}
+
+
+def _add_column(table, name, type_, extra=''):
+    # ALTER TABLE ... ADD COLUMN unless it's there already; True if added
+    if name in _columns(table):
+        return False
+    dialect = db.engine.dialect
+    quote = dialect.identifier_preparer.quote
+    db.session.execute(db.text(
+        f"ALTER TABLE {quote(table)} ADD COLUMN {quote(name)} {type_.compile(dialect=dialect)} {extra}"
+    ))
+    return True
+
+
+# --- the migrations, oldest first ---
+
+@migration('0001_initial')
+def _initial():
+    from . import models  # noqa: F401  (registers the tables)
+    db.metadata.create_all(bind=db.session.connection())
+
+
+@migration('0002_event_counters')
+def _event_counters():
+    # plain SQL from here on: the models describe the current schema, not
+    # the one this step is upgrading. The backfills don't depend on whether
+    # the column was just added: pysqlite autocommits a leading ALTER TABLE,
+    # so after a failed run the column can exist without its values.
+    _add_column('event', 'banner_variants', sa.JSON())
+    _add_column('event', 'capacity', sa.Integer())
+    _add_column('event', 'seats_sold', sa.Integer(), "NOT NULL DEFAULT 0")
+    _add_column('event', 'comment_count', sa.Integer(), "NOT NULL DEFAULT 0")
+    db.session.execute(db.text(
+        "UPDATE event SET seats_sold = (SELECT coalesce(sum(quantity), 0) FROM booking "
+        "WHERE booking.event_id = event.id AND booking.status = 'Confirmed')"
+    ))
+    db.session.execute(db.text(
+        "UPDATE event SET comment_count = (SELECT count(*) FROM comment WHERE comment.event_id = event.id)"
+    ))
+
+
+@migration('0003_event_updated_at')
+def _event_updated_at():
+    # ADD COLUMN needs a constant default; existing rows get stamped with now
+    _add_column('event', 'updated_at', sa.DateTime(), f"NOT NULL DEFAULT '{_EPOCH}'")
+    db.session.execute(db.text("UPDATE event SET updated_at = :now WHERE updated_at = :epoch"),
+                       {'now': datetime.utcnow(), 'epoch': _EPOCH})
+
+
+# the indexes 0004 shipped with; later ones come with their own migration
+# (the model may have indexes on columns an older database doesn't have yet)
+_INDEXES_0004 = (
+    'ix_event_start_at_id', 'ix_event_region_start_at', 'ix_event_category_start_at',
+    'ix_event_mode_start_at', 'ix_event_team_size_start_at', 'ix_event_status_start_at',
+    'ix_comment_event_created', 'ix_booking_order_id', 'ix_booking_event_id',
+    'ix_booking_user_booked_at',
+)
+
+
+@migration('0004_indexes')
+def _indexes():
+    # create_all skips indexes of tables that already exist
+    connection = db.session.connection()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in _INDEXES_0004:
+                index.create(bind=connection, checkfirst=True)
+
+
+@migration('0005_search_index')
+def _search_index():
+    from .search import ensure_search_index
+    ensure_search_index()
+
+
+@migration('0006_event_booking_count')
+def _event_booking_count():
+    _add_column('event', 'booking_count', sa.Integer(), "NOT NULL DEFAULT 0")
+    db.session.execute(db.text(
+        "UPDATE event SET booking_count = (SELECT count(*) FROM booking "
+        "WHERE booking.event_id = event.id AND booking.status = 'Confirmed')"
+    ))
+    db.session.execute(db.text(
+        "CREATE INDEX IF NOT EXISTS ix_event_booking_count_id ON event (booking_count, id)"
+    ))
+
+
+@migration('0007_event_day_summary')
+def _event_day_summary():
+    db.session.execute(db.text(
+        "CREATE TABLE IF NOT EXISTS event_day_summary ("
+        " day DATE NOT NULL, region VARCHAR(64) NOT NULL,"
+        " event_count INTEGER NOT NULL, open_count INTEGER NOT NULL,"
+        " PRIMARY KEY (day, region))"
+    ))
+    db.session.execute(db.text("DELETE FROM event_day_summary"))
+    db.session.execute(db.text(
+        "INSERT INTO event_day_summary (day, region, event_count, open_count) "
+        "SELECT date(start_at), coalesce(region, ''), count(*), "
+        " sum(CASE WHEN coalesce(status, 'Open') = 'Open' THEN 1 ELSE 0 END) "
+        "FROM event WHERE start_at IS NOT NULL AND coalesce(status, 'Open') != 'Cancelled' "
+        "GROUP BY date(start_at), coalesce(region, '')"
+    ))
+
+
+@migration('0008_event_popular_live')
+def _event_popular_live():
+    # ?sort=popular only lists events that aren't Completed; a partial index
+    # over those keeps it from walking the whole history
+    db.session.execute(db.text("DROP INDEX IF EXISTS ix_event_booking_count_id"))
+    db.session.execute(db.text(
+        "CREATE INDEX IF NOT EXISTS ix_event_popular_live ON event (booking_count, id) "
+        "WHERE coalesce(status, 'Open') != 'Completed'"
+    ))
+
+
+@migration('0009_event_status_booking_count')
+def _event_status_booking_count():
+    db.session.execute(db.text(
+        "CREATE INDEX IF NOT EXISTS ix_event_status_booking_count ON event (status, booking_count, id)"
+    ))
+
+
+# --- runner ---
+
+def applied_migrations():
+    schema_migrations.create(bind=db.session.connection(), checkfirst=True)
+    db.session.commit()
+    return set(db.session.execute(db.select(schema_migrations.c.name)).scalars())
+
+
+def pending_migrations():
+    done = applied_migrations()
+    return [(name, fn) for name, fn in MIGRATIONS if name not in done]
+
+
+def upgrade(log=None):
+    """Apply pending migrations in order, one transaction each. Returns their names."""
+    applied = []
+    for name, fn in pending_migrations():
+        if log:
+            log(f"Applying {name}")
+        try:
+            fn()
+            db.session.execute(
+                dialect_insert(schema_migrations).on_conflict_do_nothing(),
+                {'name': name, 'applied_at': datetime.utcnow()},
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        applied.append(name)
+    return applied
+
+
+db_cli = AppGroup('db', help="Database schema migrations.")
+
+
+@db_cli.command('upgrade')
+def upgrade_command():
+    """Apply pending schema migrations (run once per deploy)."""
+    applied = upgrade(log=click.echo)
+    click.echo(f"Applied {len(applied)} migration(s)." if applied else "Database is up to date.")
+
+
+@db_cli.command('status')
+def status_command():
+    """List applied and pending migrations."""
+    done = applied_migrations()
+    for name, _ in MIGRATIONS:
+        click.echo(f"{'applied' if name in done else 'pending'}  {name}")
+
+
+def init_migrations(app):
+    app.cli.add_command(db_cli)
+    if app.config.get('AUTO_MIGRATE'):
+        with app.app_context():
+            upgrade()
@@ -23,6 +23,22 @@ class Event(db.Model):
     start_at = db.Column(db.DateTime)
     description = db.Column(db.Text) # description field for form :)
     banner = db.Column(db.String(255)) 
+    # resized copies of an uploaded banner, filled in by media.py's worker:
+    # {"card": {"width": 640, "webp": "image/uploads/x-card.webp", "jpeg": ...}, ...}
+    banner_variants = db.Column(db.JSON(none_as_null=True))
+    # seat tracking: capacity None means unlimited. seats_sold is only ever
+    # changed by the booking service's conditional UPDATE (see booking.py)
+    capacity = db.Column(db.Integer)
+    seats_sold = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Confirmed bookings ("players registered"), bumped by the same UPDATE as
+    # seats_sold. "flask reconcile-counters" recomputes all three counters.
+    booking_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # kept in step by add_comment so the page never needs COUNT(*)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # row version for API validators (ETag / Last-Modified) and the event page
+    # cache keys. onupdate also applies to the Core UPDATEs in booking.py,
+    # comments.py, lifecycle.py and media.py
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     #im adding this to link created tournaments to users/
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -30,6 +46,25 @@ class Event(db.Model):
 
     bookings = db.relationship('Booking', backref='event', lazy=True)
 
+    # Keyset pagination on the index walks (start_at, id); each filter gets its
+    # own leading column so a filtered page is still one index range scan.
+    __table_args__ = (
+        db.Index('ix_event_start_at_id', 'start_at', 'id'),
+        db.Index('ix_event_region_start_at', 'region', 'start_at', 'id'),
+        db.Index('ix_event_category_start_at', 'category', 'start_at', 'id'),
+        db.Index('ix_event_mode_start_at', 'mode', 'start_at', 'id'),
+        db.Index('ix_event_team_size_start_at', 'team_size', 'start_at', 'id'),
+        db.Index('ix_event_status_start_at', 'status', 'start_at', 'id'),
+        # ?sort=popular walks this backwards: most booked first. Partial, so
+        # the default listing (which hides Completed events) walks only the
+        # rows it can show rather than the whole history
+        db.Index('ix_event_popular_live', 'booking_count', 'id',
+                 sqlite_where=db.text("coalesce(status, 'Open') != 'Completed'"),
+                 postgresql_where=db.text("coalesce(status, 'Open') != 'Completed'")),
+        # ?sort=popular with ?status=: that status's rows, most booked first
+        db.Index('ix_event_status_booking_count', 'status', 'booking_count', 'id'),
+    )
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'))
@@ -37,23 +72,59 @@ class Comment(db.Model):
     body = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # newest-first keyset pagination per event
+    __table_args__ = (
+        db.Index('ix_comment_event_created', 'event_id', 'created_at', 'id'),
+    )
+
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'))
     quantity = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class MediaBlob(db.Model):
+    # one row per stored upload, keyed by the SHA-256 of its bytes (see media.py)
+    digest = db.Column(db.String(64), primary_key=True)
+    ext = db.Column(db.String(8), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)  # events using it as banner
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class UserBookingSummary(db.Model):
+    # per-user totals for the booking history header, kept up to date by
+    # booking.py instead of aggregating the whole history on every view
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_bookings = db.Column(db.Integer, nullable=False, default=0)
+    total_tickets = db.Column(db.Integer, nullable=False, default=0)
+    upcoming_count = db.Column(db.Integer, nullable=False, default=0)
+    # upcoming_count is exact until the earliest counted event starts
+    upcoming_valid_until = db.Column(db.DateTime)
+
+class EventDaySummary(db.Model):
+    # events per (UTC day, region) for the calendar; rows are recomputed by
+    # availability.refresh_days() whenever a write can change them
+    day = db.Column(db.Date, primary_key=True)
+    region = db.Column(db.String(64), primary_key=True)  # '' = no region
+    event_count = db.Column(db.Integer, nullable=False, default=0)  # not cancelled
+    open_count = db.Column(db.Integer, nullable=False, default=0)   # still bookable
+
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.String(12), unique=True, index=True, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False, default=1)
     booked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     status = db.Column(db.String(24), default='Confirmed', nullable=False)  # Confirmed / Cancelled etc.
 
+    # booking history pages walk one user's bookings newest first
+    __table_args__ = (
+        db.Index('ix_booking_user_booked_at', 'user_id', 'booked_at', 'id'),
+    )
+
     @staticmethod
     def new_order_id():
         # short, human-friendly order id (e.g., 8C2F-A1D9)
         raw = uuid.uuid4().hex[:8].upper()
-        return f"{raw[:4]}-{raw[4:]}"
\ No newline at end of file
+        return f"{raw[:4]}-{raw[4:]}"
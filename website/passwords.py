@@ -0,0 +1,109 @@
+# passwords.py
+# Password hashing with a configurable bcrypt cost.
+#
+#   BCRYPT_LOG_ROUNDS      cost factor for new hashes (default 12). Hashes
+#                          with another cost are upgraded on the next login.
+#   PASSWORD_HASH_WORKERS  0 hashes on the request thread (default); N > 0
+#                          hands hashing to a pool of N processes so bcrypt
+#                          doesn't hold the web worker's CPU/GIL.
+#   PASSWORD_HASH_QUEUE    max hashes waiting for the pool; further callers
+#                          block until a slot frees up (default 4 x workers).
+import os
+import threading
+
+from flask import current_app
+
+DEFAULT_ROUNDS = 12
+# bcrypt only looks at the first 72 bytes; newer bcrypt releases raise on
+# longer input instead of truncating, so truncate like older releases did
+MAX_PASSWORD_BYTES = 72
+
+
+def _encode(password):
+    return password.encode('utf-8')[:MAX_PASSWORD_BYTES]
+
+
+# --- work functions (module level so the process pool can pickle them) ---
+def _hash(password_bytes, rounds):
+    import bcrypt
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(hashed_bytes, password_bytes):
+    import bcrypt
+    try:
+        return bcrypt.checkpw(password_bytes, hashed_bytes)
+    except ValueError:  # malformed stored hash
+        return False
+
+
+class HashingPool:
+    """Bounded process pool for bcrypt calls."""
+
+    def __init__(self, workers, queue_size):
+        # imported here: most deployments never start a pool
+        from concurrent.futures import ProcessPoolExecutor
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(queue_size)
+
+    def run(self, fn, *args):
+        with self.slots:
+            return self.executor.submit(fn, *args).result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def _pool():
+    # created on first use, so each (forked) web worker gets its own
+    app = current_app
+    workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return None
+    pool = app.extensions.get('password_pool')
+    if pool is None:
+        with app.extensions['password_pool_lock']:
+            pool = app.extensions.get('password_pool')
+            if pool is None:
+                queue = app.config.get('PASSWORD_HASH_QUEUE') or workers * 4
+                pool = app.extensions['password_pool'] = HashingPool(workers, queue)
+    return pool
+
+
+def _run(fn, *args):
+    pool = _pool()
+    return pool.run(fn, *args) if pool else fn(*args)
+
+
+def cost_of(hashed):
+    """bcrypt cost factor of a stored hash ("$2b$12$..." -> 12), or None."""
+    if isinstance(hashed, bytes):
+        hashed = hashed.decode('utf-8', 'replace')
+    parts = (hashed or '').split('$')
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def hash_password(password, rounds=None):
+    rounds = rounds or current_app.config.get('BCRYPT_LOG_ROUNDS', DEFAULT_ROUNDS)
+    return _run(_hash, _encode(password), rounds)
+
+
+def verify_password(hashed, password):
+    # older rows may hold the hash as bytes (flask_bcrypt returned bytes)
+    if isinstance(hashed, str):
+        hashed = hashed.encode('utf-8')
+    return _run(_check, hashed, _encode(password))
+
+
+def needs_rehash(hashed):
+    return cost_of(hashed) != current_app.config.get('BCRYPT_LOG_ROUNDS', DEFAULT_ROUNDS)
+
+
+def init_passwords(app):
+    app.config.setdefault('BCRYPT_LOG_ROUNDS', int(os.environ.get('BCRYPT_LOG_ROUNDS', DEFAULT_ROUNDS)))
+    app.config.setdefault('PASSWORD_HASH_WORKERS', int(os.environ.get('PASSWORD_HASH_WORKERS', 0)))
+    app.config.setdefault('PASSWORD_HASH_QUEUE', None)
+    app.extensions['password_pool_lock'] = threading.Lock()
@@ -0,0 +1,262 @@
+# queries.py
+# Shared list queries for the views. Listings use keyset (cursor) pagination
+# instead of OFFSET so every page is a bounded range scan on an index.
+import base64
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.orm import joinedload
+
+from . import db
+from .models import Event, Booking, Comment
+
+# request.args keys that map straight onto Event columns
+EVENT_FILTERS = ('region', 'category', 'mode', 'team_size', 'status')
+
+# Listings show current tournaments unless ?status= asks otherwise: not
+# Completed and not started more than EVENT_LIVE_HOURS ago (which also drops
+# old cancellations). The start_at bound is what keeps this cheap: the scan
+# starts at "now" on the (..., start_at, id) indexes instead of walking the
+# whole history; the status check just catches stragglers.
+HIDDEN_STATUS = 'Completed'
+# inline literals rather than bound parameters: SQLite only matches a
+# partial index's WHERE (ix_event_popular_live) against literal terms
+_VISIBLE = db.func.coalesce(Event.status, db.literal_column("'Open'")) != db.literal_column(f"'{HIDDEN_STATUS}'")
+
+# listing orders: (start_at, id) ascending, or most booked first using the
+# Event.booking_count counter (no aggregate query either way)
+SORTS = ('soonest', 'popular')
+
+DEFAULT_PAGE_SIZE = 12
+MAX_PAGE_SIZE = 50
+COMMENT_PAGE_SIZE = 20
+_MAX_INT = 2 ** 63 - 1
+
+
+def encode_cursor(stamp, row_id):
+    # opaque, url-safe token for the (datetime or count, id) of the last row of a page
+    text = stamp.isoformat() if isinstance(stamp, datetime) else ('' if stamp is None else str(stamp))
+    raw = f"{text}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    # returns (datetime / count / None, id) or None if the token is missing/garbage
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        text, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        if text.isdigit():
+            stamp = int(text)
+        else:
+            stamp = datetime.fromisoformat(text) if text else None
+        row_id = int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    # anything outside SQLite's integer range would overflow on binding
+    if not all(-_MAX_INT <= n <= _MAX_INT for n in (row_id, stamp) if isinstance(n, int)):
+        return None
+    return stamp, row_id
+
+
+def event_filters_from_args(args):
+    # only keep known, non-empty filters
+    return {key: args.get(key) for key in EVENT_FILTERS if args.get(key)}
+
+
+def page_size_from_args(args, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _parse_bound(text, is_end):
+    # "2026-10-24" is a whole day (an end date includes it); anything else
+    # must be an ISO datetime and is used as is
+    if len(text) == 10:
+        day = datetime.strptime(text, '%Y-%m-%d')
+        return day + timedelta(days=1) if is_end else day
+    return datetime.fromisoformat(text)
+
+
+def date_range_from_args(args):
+    """(start, end) from ?from=&to=, half-open, either side may be None.
+
+    Returns None when neither is given; raises ValueError on a malformed
+    value or an empty range.
+    """
+    start, end = args.get('from'), args.get('to')
+    if not start and not end:
+        return None
+    start = _parse_bound(start, False) if start else None
+    end = _parse_bound(end, True) if end else None
+    if start and end and end <= start:
+        raise ValueError("'to' is before 'from'")
+    return start, end
+
+
+def sort_from_args(args):
+    sort = args.get('sort')
+    return sort if sort in SORTS else SORTS[0]
+
+
+def _filtered(stmt, filters):
+    for key, value in filters.items():
+        stmt = stmt.where(getattr(Event, key) == value)
+    return stmt
+
+
+def _event_keyset(stmt, filters, cursor, sort='soonest', window=None, limit=None):
+    # filters + "after cursor" + the sort's order for an events select that
+    # will fetch `limit` rows. window=(start, end) limits start_at; with
+    # ?region= too it is one range scan on ix_event_region_start_at
+    filters = filters or {}
+    stmt = _filtered(stmt, filters)
+    upcoming_only = not window and 'status' not in filters
+    if window:
+        # an explicit range shows everything in it, past events included
+        start, end = window
+        if start:
+            stmt = stmt.where(Event.start_at >= start)
+        if end:
+            stmt = stmt.where(Event.start_at < end)
+    elif upcoming_only:
+        # TBA events (no start time yet) are always current
+        since = datetime.utcnow() - timedelta(hours=current_app.config.get('EVENT_LIVE_HOURS', 6))
+        live = Event.start_at >= since
+        stmt = stmt.where(_VISIBLE)
+
+    after = decode_cursor(cursor)
+    if sort == 'popular':
+        # walks ix_event_popular_live backwards, or with ?status=
+        # ix_event_status_booking_count; a date window sorts just its own rows
+        if upcoming_only:
+            stmt = stmt.where(db.or_(live, Event.start_at.is_(None)))
+        if after and isinstance(after[0], int):
+            stmt = stmt.where(db.tuple_(Event.booking_count, Event.id) < after)
+        return stmt.order_by(Event.booking_count.desc(), Event.id.desc())
+
+    order = (Event.start_at.asc().nulls_first(), Event.id.asc())
+    if after and after[0] is not None and not isinstance(after[0], int):
+        # past the "TBA" block at the front
+        stmt = stmt.where(db.tuple_(Event.start_at, Event.id) > after)
+        if upcoming_only:
+            stmt = stmt.where(live)
+        return stmt.order_by(*order)
+
+    tba = Event.start_at.is_(None)
+    if after:
+        tba = db.and_(tba, Event.id > after[1])
+    if upcoming_only and limit:
+        # "TBA or live" as one condition would scan the index from the NULLs
+        # through the whole history; instead take up to a page from each of
+        # the two ranges and order just those
+        front = _filtered(db.select(Event.id), filters).where(_VISIBLE)
+        tba_ids = front.where(tba).order_by(Event.id).limit(limit).subquery()
+        live_ids = front.where(live).order_by(*order).limit(limit).subquery()
+        ids = db.union_all(db.select(tba_ids.c.id), db.select(live_ids.c.id))
+        return stmt.where(Event.id.in_(ids)).order_by(*order)
+    if upcoming_only:
+        stmt = stmt.where(db.or_(tba, live))
+    elif after:
+        # still inside the "TBA" block at the front
+        stmt = stmt.where(db.or_(tba, Event.start_at.is_not(None)))
+    return stmt.order_by(*order)
+
+
+def _split_page(rows, limit, sort='soonest'):
+    # rows were fetched with limit + 1; the extra one only says "there's more"
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        key = last.booking_count if sort == 'popular' else last.start_at
+        return rows, encode_cursor(key, last.id)
+    return rows, None
+
+
+def event_page(filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE, sort='soonest', window=None):
+    """One page of events ordered by (start_at, id), or most booked first.
+
+    Returns (events, next_cursor); next_cursor is None on the last page.
+    Events without a start time sort first (SQLite's default for ASC).
+    """
+    # host is many-to-one, so a join keeps the page at one statement
+    stmt = _event_keyset(db.select(Event).options(joinedload(Event.host)), filters, cursor, sort, window,
+                         limit + 1)
+    # fetch one extra row to know whether there is a next page
+    events = db.session.execute(stmt.limit(limit + 1)).scalars().all()
+    return _split_page(events, limit, sort)
+
+
+def event_page_versions(filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE, sort='soonest', window=None):
+    """The same page as event_page() but only id/version columns.
+
+    Enough to build a validator for the page without loading the events.
+    """
+    stmt = _event_keyset(
+        db.select(Event.id, Event.start_at, Event.booking_count, Event.updated_at), filters, cursor, sort, window,
+        limit + 1,
+    )
+    return _split_page(db.session.execute(stmt.limit(limit + 1)).all(), limit, sort)
+
+
+def events_by_id(ids):
+    """Events (host loaded) for a list of ids, in the order given."""
+    if not ids:
+        return []
+    events = db.session.execute(
+        db.select(Event).options(joinedload(Event.host)).where(Event.id.in_(ids))
+    ).scalars().all()
+    by_id = {e.id: e for e in events}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def hosted_events(user_id):
+    # events hosted by one user, host loaded in the same statement
+    return db.session.execute(
+        db.select(Event)
+        .options(joinedload(Event.host))
+        .where(Event.user_id == user_id)
+        .order_by(Event.start_at.asc(), Event.id.asc())
+    ).scalars().all()
+
+
+def comment_page(event_id, cursor=None, limit=COMMENT_PAGE_SIZE):
+    """Newest-first page of an event's comments: (comments, next_cursor)."""
+    stmt = db.select(Comment).where(Comment.event_id == event_id)
+    after = decode_cursor(cursor)
+    if after and isinstance(after[0], datetime):
+        stmt = stmt.where(db.tuple_(Comment.created_at, Comment.id) < after)
+    stmt = stmt.order_by(Comment.created_at.desc(), Comment.id.desc()).limit(limit + 1)
+    comments = db.session.execute(stmt).scalars().all()
+
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        last = comments[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return comments, next_cursor
+
+
+def booking_page(user_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Newest-first page of a user's bookings with their events joined in."""
+    stmt = (
+        db.select(Booking)
+        .options(joinedload(Booking.event))
+        .where(Booking.user_id == user_id)
+    )
+    after = decode_cursor(cursor)
+    if after and isinstance(after[0], datetime):
+        stmt = stmt.where(db.tuple_(Booking.booked_at, Booking.id) < after)
+    stmt = stmt.order_by(Booking.booked_at.desc(), Booking.id.desc()).limit(limit + 1)
+    bookings = db.session.execute(stmt).scalars().all()
+
+    next_cursor = None
+    if len(bookings) > limit:
+        bookings = bookings[:limit]
+        last = bookings[-1]
+        next_cursor = encode_cursor(last.booked_at, last.id)
+    return bookings, next_cursor
@@ -0,0 +1,150 @@
+# ratelimit.py
+# Token-bucket limits for the write endpoints (booking, commenting), so a few
+# scripted clients can't queue up enough write transactions to hold the
+# SQLite lock for everybody else.
+#
+# Every limit has one bucket per user and one per client IP and a request
+# needs a token from both: one account can't flood from many addresses and
+# a pile of throwaway accounts can't flood from one. Buckets refill
+# continuously, so people posting at a human pace never notice; a script gets
+# 429 Too Many Requests with Retry-After.
+#
+#   RATE_LIMITING       on/off (default on)
+#   RATE_LIMITS         {name: {'user': (burst, per_minute), 'ip': (burst, per_minute)}}
+#   RATE_LIMIT_BACKEND  bucket storage shared by the workers; defaults to
+#                       MemoryBuckets (per process). Anything with the same
+#                       take() works, e.g. a Redis wrapper running the
+#                       refill arithmetic in a Lua script. take() has to be
+#                       all-or-nothing across the buckets it's given, or a
+#                       request refused by its IP bucket still costs its
+#                       user a token.
+#
+# Behind a reverse proxy, wrap the app in werkzeug's ProxyFix so remote_addr
+# is the client rather than the proxy.
+import functools
+import math
+import threading
+import time
+
+from flask import current_app, request
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+DEFAULT_LIMITS = {
+    'comment': {'user': (5, 10), 'ip': (20, 60)},
+    'booking': {'user': (10, 20), 'ip': (30, 90)},
+}
+
+
+class MemoryBuckets:
+    """Token buckets in this process's memory."""
+
+    # how often (in take() calls) to drop buckets that have refilled
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        # key -> (tokens, updated, full_at)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, buckets, now=None):
+        """Take a token from each of `buckets`, [(key, burst, rate per second)],
+        but only if every one of them has a token.
+
+        Returns (0, None) if they were taken, else (seconds until the first
+        bucket that's short has one, its index in `buckets`).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            levels = []
+            for i, (key, burst, rate) in enumerate(buckets):
+                tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                if tokens < 1:
+                    # nothing taken; the refill so far is kept by leaving
+                    # `updated` alone, so just report the wait
+                    return (1 - tokens) / rate, i
+                levels.append(tokens)
+            for (key, burst, rate), tokens in zip(buckets, levels):
+                tokens -= 1
+                self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+        return 0.0, None
+
+    def _sweep(self, now):
+        # a full bucket is the same as no bucket, so memory stays bounded by
+        # the clients active in the last burst/rate seconds
+        for key in [k for k, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RateLimiter:
+    def __init__(self, limits, backend=None):
+        self.limits = limits
+        self.backend = backend if backend is not None else MemoryBuckets()
+        # (limit, scope) -> requests refused
+        self.refused = {}
+        self._lock = threading.Lock()
+
+    def check(self, name, user_id, ip):
+        """0 if the request may go ahead, else seconds until it may."""
+        scopes, buckets = [], []
+        for scope, ident in (('user', user_id), ('ip', ip)):
+            if ident is None or scope not in self.limits.get(name, {}):
+                continue
+            burst, per_minute = self.limits[name][scope]
+            scopes.append(scope)
+            buckets.append((f'ratelimit:{name}:{scope}:{ident}', burst, per_minute / 60))
+        if not buckets:
+            return 0.0
+        wait, short = self.backend.take(buckets)
+        if wait:
+            with self._lock:
+                key = (name, scopes[short])
+                self.refused[key] = self.refused.get(key, 0) + 1
+        return wait
+
+    def render_metrics(self):
+        with self._lock:
+            snapshot = dict(self.refused)
+        lines = ["# HELP app_rate_limited_total Requests refused by a rate limit.",
+                 "# TYPE app_rate_limited_total counter"]
+        for (name, scope), count in sorted(snapshot.items()):
+            lines.append(f'app_rate_limited_total{{limit="{name}",scope="{scope}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def rate_limited(name):
+    """Apply the `name` limit to a view (put it below @login_required)."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limiter')
+            if limiter is not None:
+                user_id = current_user.get_id() if current_user.is_authenticated else None
+                wait = limiter.check(name, user_id, request.remote_addr)
+                if wait:
+                    seconds = math.ceil(wait)
+                    raise TooManyRequests(f"Slow down a little; try again in {seconds}s.", retry_after=seconds)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_ratelimit(app):
+    from .instrumentation import add_metrics_collector
+
+    app.config.setdefault('RATE_LIMITING', True)
+    app.config.setdefault('RATE_LIMITS', DEFAULT_LIMITS)
+    app.config.setdefault('RATE_LIMIT_BACKEND', None)
+    if not app.config['RATE_LIMITING']:
+        return
+    limiter = RateLimiter(app.config['RATE_LIMITS'], app.config['RATE_LIMIT_BACKEND'])
+    app.extensions['rate_limiter'] = limiter
+    add_metrics_collector(app, limiter.render_metrics)
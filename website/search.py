@@ -0,0 +1,192 @@
+# search.py
+# Full-text search over events.
+#
+# SQLite: an external-content FTS5 table (event_fts) mirrors the searchable
+# Event columns. Triggers keep it in step on insert/delete and on updates to
+# those columns only, so seat/comment counter updates never touch the index.
+# PostgreSQL: a GIN index over a to_tsvector() expression, which Postgres
+# maintains by itself.
+import re
+from contextlib import contextmanager
+
+import click
+from flask.cli import with_appcontext
+from . import db
+from .queries import events_by_id
+
+SEARCH_COLUMNS = ('title', 'description', 'category', 'mode', 'region')
+# bm25 weights, same order as SEARCH_COLUMNS: a title hit counts most
+SEARCH_WEIGHTS = (10.0, 1.0, 3.0, 3.0, 3.0)
+SEARCH_PAGE_SIZE = 12
+# bm25 over every match of a very common word costs O(matches), ~200 ms at
+# 100k events. SQLite ranks matches in batches instead: the newest
+# SEARCH_BATCH matches (FTS5 walks rowids backwards cheaply) are ranked and
+# paged through first, then the next-older batch, and so on. Every match is
+# reachable; past the first batch, relevance only orders results within a
+# batch, and the search page says so. 400 keeps search_bench (100k events)
+# under 10 ms at p99.
+SEARCH_BATCH = 400
+MAX_SEARCH_PAGE = 500
+
+_SQLITE_SETUP = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS event_fts USING fts5(
+        {', '.join(SEARCH_COLUMNS)},
+        content='event', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS event_fts_ai AFTER INSERT ON event BEGIN
+        INSERT INTO event_fts(rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS event_fts_ad AFTER DELETE ON event BEGIN
+        INSERT INTO event_fts(event_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS event_fts_au AFTER UPDATE OF {', '.join(SEARCH_COLUMNS)} ON event BEGIN
+        INSERT INTO event_fts(event_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+        INSERT INTO event_fts(rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END""",
+]
+
+_PG_DOCUMENT = "to_tsvector('english', " + " || ' ' || ".join(
+    f"coalesce({c}, '')" for c in SEARCH_COLUMNS
+) + ")"
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def ensure_search_index():
+    """Create the search index if it's missing; returns True if it was created."""
+    if _dialect() == 'postgresql':
+        db.session.execute(db.text(
+            f"CREATE INDEX IF NOT EXISTS ix_event_search ON event USING GIN ({_PG_DOCUMENT})"
+        ))
+        db.session.commit()
+        return False
+    existed = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event_fts'"
+    )).first() is not None
+    for statement in _SQLITE_SETUP:
+        db.session.execute(db.text(statement))
+    if not existed:
+        # rank = weighted bm25, so queries can ORDER BY rank
+        weights = ', '.join(str(w) for w in SEARCH_WEIGHTS)
+        db.session.execute(db.text(
+            f"INSERT INTO event_fts(event_fts, rank) VALUES ('rank', 'bm25({weights})')"
+        ))
+        # index whatever rows were there before the table existed
+        rebuild_search_index(commit=False)
+    db.session.commit()
+    return not existed
+
+
+def rebuild_search_index(commit=True):
+    if _dialect() == 'postgresql':
+        db.session.execute(db.text("REINDEX INDEX ix_event_search"))
+    else:
+        db.session.execute(db.text("INSERT INTO event_fts(event_fts) VALUES ('rebuild')"))
+    if commit:
+        db.session.commit()
+
+
+@contextmanager
+def search_index_paused():
+    """Bulk-load events without per-row index maintenance.
+
+    SQLite: drops the insert trigger for the duration and rebuilds event_fts
+    in one pass afterwards, which is several times faster than letting the
+    trigger tokenize row by row. The rebuild reads the whole event table, so
+    rows inserted by anyone else meanwhile are indexed too. PostgreSQL keeps
+    its GIN index up to date by itself, so nothing changes there.
+    """
+    if _dialect() == 'postgresql':
+        yield
+        return
+    db.session.execute(db.text("DROP TRIGGER IF EXISTS event_fts_ai"))
+    db.session.commit()
+    try:
+        yield
+    finally:
+        db.session.rollback()
+        for statement in _SQLITE_SETUP:
+            db.session.execute(db.text(statement))
+        rebuild_search_index()
+
+
+def _fts_query(text):
+    # quote each word so user input can't inject FTS syntax; all words must match
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        return None
+    return ' '.join(f'"{t}"' for t in terms)
+
+
+def _batch_size(per_page):
+    # a whole number of pages, so no page straddles two batches
+    return max(1, SEARCH_BATCH // per_page) * per_page
+
+
+def search_event_ids(text, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Ranked event ids for a query: (ids, has_next, batched).
+
+    batched is True when the query has more matches than one ranking batch
+    (SQLite only).
+    """
+    page = min(max(page, 1), MAX_SEARCH_PAGE)
+    offset = (page - 1) * per_page
+    if _dialect() == 'postgresql':
+        terms = ' '.join(re.findall(r'\w+', text or ''))
+        if not terms:
+            return [], False, False
+        rows = db.session.execute(db.text(
+            f"SELECT id FROM event WHERE {_PG_DOCUMENT} @@ websearch_to_tsquery('english', :q) "
+            f"ORDER BY ts_rank({_PG_DOCUMENT}, websearch_to_tsquery('english', :q)) DESC, id "
+            "LIMIT :limit OFFSET :offset"
+        ), {'q': terms, 'limit': per_page + 1, 'offset': offset}).scalars().all()
+        return rows[:per_page], len(rows) > per_page and page < MAX_SEARCH_PAGE, False
+
+    query = _fts_query(text)
+    if not query:
+        return [], False, False
+    batch = _batch_size(per_page)
+    skip, offset = divmod(offset, batch)
+    rows = db.session.execute(db.text(
+        "SELECT rowid, count(*) OVER () FROM ("
+        "  SELECT rowid, rank FROM event_fts WHERE event_fts MATCH :q"
+        "  ORDER BY rowid DESC LIMIT :batch OFFSET :skip"
+        ") ORDER BY rank, rowid LIMIT :limit OFFSET :offset"
+    ), {'q': query, 'batch': batch, 'skip': skip * batch,
+        'limit': per_page + 1, 'offset': offset}).all()
+    full = bool(rows) and rows[0][1] == batch
+    ids = [row[0] for row in rows]
+    has_next = len(ids) > per_page
+    if not has_next and full:
+        # end of a full batch: is there an older one?
+        has_next = db.session.execute(db.text(
+            "SELECT rowid FROM event_fts WHERE event_fts MATCH :q "
+            "ORDER BY rowid DESC LIMIT 1 OFFSET :skip"
+        ), {'q': query, 'skip': (skip + 1) * batch}).first() is not None
+    return ids[:per_page], has_next and page < MAX_SEARCH_PAGE, skip > 0 or full
+
+
+def search_events(text, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Ranked Event rows (host loaded) for a query: (events, has_next, batched)."""
+    ids, has_next, batched = search_event_ids(text, page, per_page)
+    return events_by_id(ids), has_next, batched
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Rebuild the event full-text index from the event table."""
+    ensure_search_index()
+    rebuild_search_index()
+    click.echo("Search index rebuilt.")
+
+
+def init_search(app):
+    # the index itself is created by the 0005_search_index migration
+    app.cli.add_command(rebuild_search_index_command)
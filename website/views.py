@@ -1,52 +1,151 @@
 # views.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user, logout_user
-from datetime import datetime
-from werkzeug.utils import secure_filename
+from calendar import Calendar
+from datetime import datetime, timedelta
 from urllib.parse import urlparse
-import os
 
 from . import db
-from .models import Event, Comment, Order, User, Booking
-from .forms import EventForm, LoginForm, RegisterForm, BookingForm
-
+from .models import Event, Order, User
+from .booking import book_seats, booking_summary, event_rescheduled, BookingError
+from .cache import event_cache
+from .comments import post_comment
+from .availability import day_key, refresh_days, month_start, month_summary, next_month, this_month
+from .ratelimit import rate_limited
+from .media import save_upload, set_banner, queue_variants
+from .search import search_events, SEARCH_BATCH, MAX_SEARCH_PAGE
+from .queries import (
+    event_page, event_filters_from_args, page_size_from_args, sort_from_args, date_range_from_args,
+    hosted_events,
+    comment_page, COMMENT_PAGE_SIZE, booking_page,
+)
+
+# forms are imported inside the views that use them, so booting a worker
+# (or a CLI command) doesn't pay for WTForms and its validators
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def index():
-    events = db.session.execute(
-        db.select(Event).order_by(Event.start_at.asc())
-    ).scalars().all()
-    return render_template('index.html', events=events)
+    filters = event_filters_from_args(request.args)
+    sort = sort_from_args(request.args)
+    events, next_cursor = event_page(
+        filters,
+        cursor=request.args.get('cursor'),
+        limit=page_size_from_args(request.args),
+        sort=sort,
+    )
+    return render_template('index.html', events=events, filters=filters, sort=sort,
+                           next_cursor=next_cursor)
+
+@main_bp.route('/events')
+def events_in_range():
+    # /events?from=2026-10-24&to=2026-10-25&region=OCE ("this weekend in OCE")
+    filters = event_filters_from_args(request.args)
+    try:
+        window = date_range_from_args(request.args)
+    except ValueError:
+        flash("Dates should look like 2026-10-24.", "warning")
+        window = None
+    events, next_cursor = ([], None)
+    if window:
+        events, next_cursor = event_page(
+            filters,
+            cursor=request.args.get('cursor'),
+            limit=page_size_from_args(request.args),
+            window=window,
+        )
+    return render_template('events-range.html', events=events, filters=filters, next_cursor=next_cursor,
+                           date_from=request.args.get('from', ''), date_to=request.args.get('to', ''))
+
+@main_bp.route('/calendar')
+def calendar_month():
+    try:
+        first = month_start(request.args.get('month') or this_month())
+    except ValueError:
+        flash("Months look like 2026-10.", "warning")
+        first = month_start(this_month())
+    region = request.args.get('region') or None
+    days, regions = month_summary(first, region)
+    return render_template('calendar.html', first=first, days=days, region=region, regions=regions,
+                           weeks=Calendar().monthdatescalendar(first.year, first.month),
+                           prev_month=(first - timedelta(days=1)).strftime('%Y-%m'),
+                           next_month=next_month(first).strftime('%Y-%m'))
+
+@main_bp.route('/search')
+def search():
+    q = request.args.get('q', '').strip()
+    page = min(max(request.args.get('page', 1, type=int), 1), MAX_SEARCH_PAGE)
+    events, has_next, batched = search_events(q, page) if q else ([], False, False)
+    return render_template('search.html', q=q, events=events, page=page,
+                           has_next=has_next, batched=batched, batch_size=SEARCH_BATCH)
 
 @main_bp.route('/events/<int:event_id>')
 def event_details(event_id):
-    event = db.session.get(Event, event_id)
+    from .forms import BookingForm
     form = BookingForm()
-    if not event:
-        flash("Event not found.", "warning")
-        return redirect(url_for('main.index'))
-
-    comments = db.session.execute(
-        db.select(Comment).where(Comment.event_id == event_id).order_by(Comment.created_at.desc())
-    ).scalars().all()
-
-    return render_template('event-details.html', event=event, comments=comments, form=form)
+    cache = event_cache()
+    key = cache.key(event_id)
+    page = cache.get(key)
+    if page is None:
+        event = db.session.get(Event, event_id)
+        if not event:
+            flash("Event not found.", "warning")
+            return redirect(url_for('main.index'))
+
+        # newest page only; older ones come from event_comments via "Load more"
+        comments, next_cursor = comment_page(event_id)
+
+        # only user-independent parts are cached; host buttons, the booking
+        # form and flashes are rendered per request around them
+        page = {
+            'id': event.id,
+            'title': event.title,
+            'status': event.status,
+            'user_id': event.user_id,
+            'banner': event.banner,
+            'banner_variants': event.banner_variants,
+            'comment_count': event.comment_count,
+            'comments_cursor': next_cursor,
+            'info_html': render_template('event-info.html', event=event),
+            'comments_html': render_template('event-comments.html', comments=comments),
+        }
+        cache.set(key, page)
+
+    return render_template('event-details.html', event=page, form=form,
+                           info_html=page['info_html'], comments_html=page['comments_html'])
+
+@main_bp.route('/events/<int:event_id>/comments')
+def event_comments(event_id):
+    # JSON page of comments for the "Load more" button
+    comments, next_cursor = comment_page(
+        event_id,
+        cursor=request.args.get('cursor'),
+        limit=page_size_from_args(request.args, default=COMMENT_PAGE_SIZE),
+    )
+    return jsonify({
+        'comments': [
+            {
+                'id': c.id,
+                'author': c.author or 'Anonymous',
+                'body': c.body,
+                'created_at': c.created_at.isoformat() if c.created_at else None,
+                'created_display': c.created_at.strftime('%d %b %Y, %I:%M %p') if c.created_at else '',
+            }
+            for c in comments
+        ],
+        'next_cursor': next_cursor,
+    })
 
 @main_bp.route('/create', methods=['GET', 'POST'])
 @login_required
 def create_event():
+    from .forms import EventForm
     form = EventForm()
     if form.validate_on_submit():
         banner_path = None
-        if form.banner_upload.data:
-            file = form.banner_upload.data
-            filename = secure_filename(file.filename)
-            img_dir = os.path.join(current_app.static_folder, 'img')
-            os.makedirs(img_dir, exist_ok=True)
-            filepath = os.path.join(img_dir, filename)
-            file.save(filepath)
-            banner_path = f'img/{filename}'
+        uploaded = form.banner_upload.data
+        if uploaded and uploaded.filename:
+            banner_path = save_upload(uploaded)
         elif form.banner_url.data:
             banner_path = form.banner_url.data.strip()
 
@@ -59,14 +158,18 @@ def create_event():
             team_size=form.team_size.data,
             mode=form.mode.data,
             prize=form.prize.data,
+            capacity=form.capacity.data,
             start_at=start_at,
             status='Open',
             description=form.description.data,
-            banner=banner_path,
             user_id=current_user.id,
         )
+        set_banner(new_event, banner_path)
         db.session.add(new_event)
+        refresh_days([day_key(start_at, new_event.region)])
         db.session.commit()
+        if uploaded and uploaded.filename:
+            queue_variants(new_event.id, banner_path)
         flash('Tournament created successfully!', 'success')
         return redirect(url_for('main.event_details', event_id=new_event.id))
     return render_template('create-event.html', form=form)
@@ -83,6 +186,7 @@ def edit_event(event_id):
         flash("You can only edit tournaments you created.", "warning")
         return redirect(url_for('main.event_details', event_id=event_id))
 
+    from .forms import EventForm
     form = EventForm(obj=event)
 
     if request.method == 'GET' and event.start_at:
@@ -93,6 +197,8 @@ def edit_event(event_id):
         flash(str(form.errors), 'danger')
 
     if form.validate_on_submit():
+        # the calendar row it leaves (if date/region change) and the one it joins
+        old_day = day_key(event.start_at, event.region)
         event.title       = form.title.data
         event.category    = form.category.data
         event.region      = form.region.data
@@ -100,20 +206,38 @@ def edit_event(event_id):
         event.mode        = form.mode.data
         event.prize       = form.prize.data
         event.description = form.description.data
-        event.start_at = datetime.combine(form.date.data, form.time.data)
+        new_start = datetime.combine(form.date.data, form.time.data)
+        if new_start != event.start_at:
+            event_rescheduled(event.id)
+            # moved back into the future: bookable again until the scheduler
+            # sees it start (the capacity check below re-marks Sold Out)
+            if event.status in ('Live', 'Completed') and new_start > datetime.utcnow():
+                event.status = 'Open'
+        event.start_at = new_start
+
+        # capacity can't drop below what's already been sold
+        if form.capacity.data is not None and form.capacity.data < (event.seats_sold or 0):
+            flash(f"Capacity can't be lower than the {event.seats_sold} seats already booked.", 'danger')
+            return render_template('create-event.html', form=form, page_title="Edit Tournament",
+                                   submit_text="Save Changes", event=event)
+        event.capacity = form.capacity.data
+        full = event.capacity is not None and (event.seats_sold or 0) >= event.capacity
+        if event.status == 'Open' and full:
+            event.status = 'Sold Out'
+        elif event.status == 'Sold Out' and not full:
+            event.status = 'Open'
 
         uploaded = form.banner_upload.data
+        banner_changed = False
         if uploaded and uploaded.filename:
-            filename  = secure_filename(uploaded.filename)
-            img_dir   = os.path.join(current_app.static_folder, 'img')
-            os.makedirs(img_dir, exist_ok=True)
-            filepath  = os.path.join(img_dir, filename)
-            uploaded.save(filepath)
-            event.banner = f'img/{filename}'
+            banner_changed = set_banner(event, save_upload(uploaded))
         elif form.banner_url.data:
-            event.banner = form.banner_url.data.strip()
+            set_banner(event, form.banner_url.data.strip())
 
+        refresh_days([old_day, day_key(event.start_at, event.region)])
         db.session.commit()
+        if banner_changed:
+            queue_variants(event.id, event.banner)
         flash('Tournament updated successfully!', 'success')
         return redirect(url_for('main.index'))  # back to dashboard
 
@@ -126,13 +250,13 @@ def edit_event(event_id):
 
 @main_bp.route('/events/<int:event_id>/comment', methods=['POST'])
 @login_required
+@rate_limited('comment')
 def add_comment(event_id):
     body = request.form.get('body')
     author = current_user.name if getattr(current_user, "name", None) else "User"
     if body:
-        comment = Comment(event_id=event_id, body=body, author=author)
-        db.session.add(comment)
-        db.session.commit()
+        # bumps comment_count with it; may be queued (COMMENT_WRITE_BEHIND)
+        post_comment(event_id, author, body)
         flash("Comment posted!", "success")
     return redirect(url_for('main.event_details', event_id=event_id))
 
@@ -157,6 +281,7 @@ def cancel_event(event_id):
 
     # Adding cancel logic as requested by tutor
     event.status = "Cancelled"
+    refresh_days([day_key(event.start_at, event.region)])
     db.session.commit()
 
     flash("Tournament cancelled successfully!", "warning")
@@ -180,17 +305,21 @@ def reopen_event(event_id):
         flash("Only cancelled tournaments can be reopened.", "warning")
         return redirect(url_for('main.event_details', event_id=event_id))
     
-    # Changing status back to Open
-    event.status = "Open"
+    # Changing status back to Open, or Sold Out if it was already full
+    full = event.capacity is not None and (event.seats_sold or 0) >= event.capacity
+    event.status = "Sold Out" if full else "Open"
+    refresh_days([day_key(event.start_at, event.region)])
     db.session.commit()
 
-    flash("Tournament is open for booking again.", "event")
+    flash("Tournament is sold out again." if full else "Tournament is open for booking again.", "event")
     return redirect(url_for('main.event_details', event_id=event_id))
 
 
 @main_bp.route('/events/<int:event_id>/book', methods=['POST'])
 @login_required
+@rate_limited('booking')
 def book_event(event_id):
+    from .forms import BookingForm
     form = BookingForm()
     if form.validate_on_submit():
         qty = form.quantity.data
@@ -207,16 +336,11 @@ def book_event(event_id):
         flash('Invalid quantity.', 'danger')
         return redirect(url_for('main.event_details', event_id=event_id))
 
-    booking = Booking(
-        order_id=Booking.new_order_id(),
-        user_id=current_user.id,
-        event_id=event_id,
-        quantity=qty,
-        booked_at=datetime.utcnow(),
-        status='Confirmed',
-    )
-    db.session.add(booking)
-    db.session.commit()
+    try:
+        booking = book_seats(event_id, current_user.id, qty)
+    except BookingError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('main.event_details', event_id=event_id))
     flash(f'Booking successful! Order ID: {booking.order_id}', 'success')
     return redirect(url_for('main.booking_history'))
 
@@ -224,12 +348,14 @@ def book_event(event_id):
 @main_bp.route('/history')
 @login_required
 def booking_history():
-    bookings = db.session.execute(
-        db.select(Booking)
-        .where(Booking.user_id == current_user.id)
-        .order_by(Booking.booked_at.desc())
-    ).scalars().all()
-    return render_template('booking-history.html', bookings=bookings)
+    bookings, next_cursor = booking_page(
+        current_user.id,
+        cursor=request.args.get('cursor'),
+        limit=page_size_from_args(request.args),
+    )
+    summary = booking_summary(current_user.id)
+    return render_template('booking-history.html', bookings=bookings,
+                           next_cursor=next_cursor, summary=summary)
 
 @main_bp.route('/users/<int:user_id>')
 def user_profile(user_id):
@@ -237,18 +363,18 @@ def user_profile(user_id):
     if not user:
         flash("User not found.", "warning")
         return redirect(url_for('main.index'))
-    hosted = db.session.execute(
-        db.select(Event).where(Event.user_id == user_id).order_by(Event.start_at.asc())
-    ).scalars().all()
+    hosted = hosted_events(user_id)
     return render_template('user-profile.html', user=user, hosted=hosted)
 
 @main_bp.route('/login')
 def login():
+    from .forms import LoginForm
     form = LoginForm()
     return render_template('user.html', form=form)
 
 @main_bp.route('/register')
 def register():
+    from .forms import RegisterForm
     form = RegisterForm()
     return render_template('register.html', form=form)
 